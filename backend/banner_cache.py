@@ -0,0 +1,247 @@
+import os
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+
+class BannerCache:
+    def __init__(
+        self,
+        storage_bucket,
+        cache_dir=".cache/play_banners",
+        max_memory_bytes=64 * 1024 * 1024,
+        negative_ttl=60,
+        rendition="thumbnail",
+        max_prefetch_workers=8,
+    ):
+        # One cache per process, shared by every session. The memory tier is
+        # bounded by bytes, the disk tier keeps each image once under its
+        # content hash, and (game_pk, play_id) only points at that hash.
+        self.storage_bucket = storage_bucket
+        self.cache_dir = cache_dir
+        self.max_memory_bytes = max_memory_bytes
+        self.negative_ttl = negative_ttl
+        self.rendition = rendition
+
+        self.memory = OrderedDict()
+        self.memory_bytes = 0
+        self.missing = {}
+        self.lock = threading.Lock()
+
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "negative_hits": 0, "misses": 0}
+
+        # Downloads run on a shared pool, one per banner however many sessions ask
+        self.prefetch_executor = ThreadPoolExecutor(max_workers=max_prefetch_workers, thread_name_prefix="banner-prefetch")
+        self.in_flight = {}
+
+        os.makedirs(os.path.join(cache_dir, "objects"), exist_ok=True)
+
+        self.db = sqlite3.connect(os.path.join(cache_dir, "index.sqlite3"), check_same_thread=False)
+        self.db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS banners (
+                game_pk TEXT NOT NULL,
+                play_id TEXT NOT NULL,
+                rendition TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                PRIMARY KEY (game_pk, play_id, rendition)
+            )
+            """
+        )
+        self.db.commit()
+
+
+    def _object_path(self, digest):
+        return os.path.join(self.cache_dir, "objects", digest)
+
+
+    def _remember(self, key, image_bytes):
+        previous = self.memory.pop(key, None)
+        if previous is not None:
+            self.memory_bytes -= len(previous)
+
+        self.memory[key] = image_bytes
+        self.memory_bytes += len(image_bytes)
+
+        while self.memory_bytes > self.max_memory_bytes and self.memory:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_bytes -= len(evicted)
+
+
+    def _read_disk(self, key):
+        with self.lock:
+            row = self.db.execute(
+                "SELECT digest FROM banners WHERE game_pk = ? AND play_id = ? AND rendition = ?",
+                key,
+            ).fetchone()
+
+        if not row:
+            return None
+
+        try:
+            with open(self._object_path(row[0]), "rb") as image_file:
+                return image_file.read()
+
+        except OSError:
+            return None
+
+
+    def _write_disk(self, key, image_bytes):
+        digest = hashlib.sha256(image_bytes).hexdigest()
+        object_path = self._object_path(digest)
+
+        # Written under a temporary name first, so a reader never sees half a file
+        if not os.path.exists(object_path):
+            temporary_path = f"{object_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+            with open(temporary_path, "wb") as image_file:
+                image_file.write(image_bytes)
+
+            os.replace(temporary_path, object_path)
+
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO banners (game_pk, play_id, rendition, digest) VALUES (?, ?, ?, ?)",
+                (*key, digest),
+            )
+            self.db.commit()
+
+
+    def get(self, game_pk, play_id):
+        key = (str(game_pk), play_id, self.rendition)
+
+        with self.lock:
+            image_bytes = self.memory.get(key)
+
+            if image_bytes is not None:
+                self.memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return image_bytes
+
+            # Banners that were not there a moment ago are not looked up again
+            # until the negative entry expires, the worker may still upload them
+            if self.missing.get(key, 0) > time.time():
+                self.stats["negative_hits"] += 1
+                return None
+
+        image_bytes = self._read_disk(key)
+
+        if image_bytes is not None:
+            with self.lock:
+                self.stats["disk_hits"] += 1
+                self._remember(key, image_bytes)
+
+            return image_bytes
+
+        with self.lock:
+            self.stats["misses"] += 1
+
+        image_bytes = self.storage_bucket.fetch_play_banner_bytes(game_pk, play_id, self.rendition)
+
+        if image_bytes is None:
+            with self.lock:
+                now = time.time()
+                self.missing = {
+                    missing_key: expires_at for missing_key, expires_at in self.missing.items()
+                    if expires_at > now
+                }
+                self.missing[key] = now + self.negative_ttl
+
+            return None
+
+        self._write_disk(key, image_bytes)
+
+        with self.lock:
+            self.missing.pop(key, None)
+            self._remember(key, image_bytes)
+
+        return image_bytes
+
+
+    def peek(self, game_pk, play_id):
+        # Memory tier only, for renders that must not wait on disk or GCS.
+        # Returns (image_bytes, is_missing).
+        key = (str(game_pk), play_id, self.rendition)
+
+        with self.lock:
+            image_bytes = self.memory.get(key)
+
+            if image_bytes is not None:
+                self.memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return image_bytes, False
+
+            return None, self.missing.get(key, 0) > time.time()
+
+
+    def _load(self, key):
+        try:
+            return self.get(key[0], key[1])
+
+        finally:
+            with self.lock:
+                self.in_flight.pop(key, None)
+
+
+    def prefetch(self, game_pk, play_ids):
+        # Starts loading every banner that is not in memory yet and returns
+        # {play_id: Future}. Banners already being loaded share their future.
+        futures = {}
+
+        for play_id in play_ids:
+            key = (str(game_pk), play_id, self.rendition)
+
+            with self.lock:
+                if key in self.memory or self.missing.get(key, 0) > time.time():
+                    future = Future()
+                    future.set_result(self.memory.get(key))
+
+                else:
+                    future = self.in_flight.get(key)
+
+                    if future is None:
+                        future = self.prefetch_executor.submit(self._load, key)
+                        self.in_flight[key] = future
+
+            futures[play_id] = future
+
+        return futures
+
+
+    def invalidate(self, game_pk, play_id):
+        key = (str(game_pk), play_id, self.rendition)
+
+        with self.lock:
+            image_bytes = self.memory.pop(key, None)
+            if image_bytes is not None:
+                self.memory_bytes -= len(image_bytes)
+
+            self.missing.pop(key, None)
+
+
+    def get_stats(self):
+        with self.lock:
+            return dict(
+                self.stats,
+                memory_entries=len(self.memory),
+                memory_bytes=self.memory_bytes,
+                negative_entries=len(self.missing),
+            )
+
+
+
+if __name__ == "__main__":
+    class LocalBannerBucket:
+        def fetch_play_banner_bytes(self, game_pk, play_id, rendition="thumbnail"):
+            return b"banner bytes" if play_id == "c985139e" else None
+
+    banner_cache = BannerCache(LocalBannerBucket(), max_memory_bytes=1024)
+
+    print(banner_cache.get("747962", "c985139e"), banner_cache.get("747962", "c985139e"))
+    print(banner_cache.get("747962", "missing"), banner_cache.get("747962", "missing"))
+    print({play_id: future.result() for play_id, future in banner_cache.prefetch("747962", ["c985139e", "a1b2c3d4"]).items()})
+    print(banner_cache.get_stats())
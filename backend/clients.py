@@ -0,0 +1,125 @@
+import threading
+
+from google import genai
+from google.cloud import storage, translate_v3
+from google.oauth2 import service_account
+from google.cloud.sql.connector import Connector
+
+import vertexai
+import firebase_admin
+from firebase_admin import credentials as firebase_credentials, firestore
+
+
+
+# Every Google client is built once per process and shared by all Streamlit
+# sessions and worker threads. The credentials are not refreshed up front, the
+# clients refresh the access token themselves the first time it is needed.
+_clients = {}
+_clients_lock = threading.RLock()
+
+GCP_PROJECT = "project-mlb-tool-tips"
+GCP_LOCATION = "us-central1"
+CLOUD_PLATFORM_SCOPES = ["https://www.googleapis.com/auth/cloud-platform"]
+
+
+def _get_or_create(key, factory):
+    client = _clients.get(key)
+
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+
+            if client is None:
+                client = factory()
+                _clients[key] = client
+
+    return client
+
+
+def get_service_account_credentials(key_file, scopes=None):
+    return _get_or_create(
+        ("credentials", key_file, tuple(scopes or [])),
+        lambda: service_account.Credentials.from_service_account_file(key_file, scopes=scopes),
+    )
+
+
+def get_genai_client():
+    def create_client():
+        credentials = get_service_account_credentials(
+            "config/vertexai_service_account_key.json", CLOUD_PLATFORM_SCOPES
+        )
+
+        return genai.Client(
+            vertexai=True,
+            project=GCP_PROJECT,
+            location=GCP_LOCATION,
+            credentials=credentials,
+        )
+
+    return _get_or_create("genai", create_client)
+
+
+def init_vertexai():
+    def create_client():
+        credentials = get_service_account_credentials(
+            "config/vertexai_service_account_key.json", CLOUD_PLATFORM_SCOPES
+        )
+
+        vertexai.init(
+            project=GCP_PROJECT,
+            location=GCP_LOCATION,
+            credentials=credentials,
+        )
+        return True
+
+    return _get_or_create("vertexai", create_client)
+
+
+def get_translation_client():
+    def create_client():
+        credentials = get_service_account_credentials(
+            "config/cloud_translation_api_admin_service_account_key.json", CLOUD_PLATFORM_SCOPES
+        )
+        return translate_v3.TranslationServiceClient(credentials=credentials)
+
+    return _get_or_create("translation", create_client)
+
+
+def get_storage_client():
+    def create_client():
+        credentials = get_service_account_credentials(
+            "config/cloud_storage_service_account_key.json", CLOUD_PLATFORM_SCOPES
+        )
+
+        return storage.Client(
+            credentials=credentials,
+            project=credentials.project_id,
+        )
+
+    return _get_or_create("storage", create_client)
+
+
+def get_firebase_app():
+    def create_client():
+        try:
+            return firebase_admin.get_app()
+
+        except ValueError:
+            cred = firebase_credentials.Certificate("config/firebase_service_account_key.json")
+            return firebase_admin.initialize_app(cred)
+
+    return _get_or_create("firebase", create_client)
+
+
+def get_firestore_client():
+    return _get_or_create("firestore", lambda: firestore.client(get_firebase_app()))
+
+
+def get_sql_connector():
+    def create_client():
+        credentials = get_service_account_credentials(
+            "config/cloud_sql_editor_service_account_key.json"
+        )
+        return Connector(credentials=credentials)
+
+    return _get_or_create("sql_connector", create_client)
@@ -1,33 +1,99 @@
+import json
 import time
+import threading
 import streamlit as st
+from collections import OrderedDict
 
-from google import genai
 from google.genai import types
-from google.oauth2 import service_account
-from google.auth.transport.requests import Request
 import google.generativeai as generativeai
 
-import vertexai
 from vertexai.preview.vision_models import ImageGenerationModel, GeneratedImage
 
+from backend.utils import MLBPlayUtils
+from backend.response_cache import ResponseCache, get_response_cache
+from backend.clients import get_genai_client, init_vertexai
 
 
-class VertexAIChat:
-    def __init__(self):
-        credentials = service_account.Credentials.from_service_account_file(
-            "config/vertexai_service_account_key.json", 
-            scopes=["https://www.googleapis.com/auth/cloud-platform"]
+# Fields every generated play summary must have, as required by its response schema
+PLAY_SUMMARY_FIELDS = ["setup", "summary_of_play_events", "outcome", "overall_strategy_insights", "image_prompt"]
+
+
+def _is_answer(text):
+    # Empty answers are never cached or shared
+    return isinstance(text, str) and text.strip() != ""
+
+
+def _is_play_summary(text):
+    # Truncated or malformed JSON would otherwise be cached for days and
+    # fail the play on every pass
+    try:
+        play_summary = json.loads(text)
+
+    except (TypeError, ValueError):
+        return False
+
+    return isinstance(play_summary, dict) and all(
+        isinstance(play_summary.get(field), str) for field in PLAY_SUMMARY_FIELDS
+    )
+
+
+
+class FakeGeminiChat:
+    # Local stand-in for a genai chat session, used to exercise the dialog and
+    # the streaming path without Vertex AI credentials
+    def __init__(self, response_text=None, chunk_size=12, chunk_delay=0.05):
+        self.response_text = response_text or (
+            "That was a well placed pitch on the outer edge. The batter was "
+            "sitting on something inside, so the best they could do was roll "
+            "it over to the shortstop."
         )
-        credentials.refresh(Request())
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.messages = []
+
 
-        self.client = genai.Client(
-            vertexai=True, 
-            project='project-mlb-tool-tips', 
-            location='us-central1',
-            credentials=credentials,
+    def send_message(self, message):
+        self.messages.append(message)
+        return types.GenerateContentResponse(
+            candidates=[types.Candidate(content=types.Content(
+                role="model", parts=[types.Part(text=self.response_text)]
+            ))]
         )
 
-        system_instruction = f"""
+
+    def send_message_stream(self, message):
+        self.messages.append(message)
+
+        for start in range(0, len(self.response_text), self.chunk_size):
+            time.sleep(self.chunk_delay)
+            yield types.GenerateContentResponse(
+                candidates=[types.Candidate(content=types.Content(
+                    role="model", parts=[types.Part(text=self.response_text[start:start + self.chunk_size])]
+                ))]
+            )
+
+
+
+class VertexAIChat:
+    def __init__(self, chat=None, play_data=None, play_summary=None, max_history_turns=6, response_cache=None):
+        self.model = 'gemini-2.0-flash-exp'
+        self.max_history_turns = max_history_turns
+        self.response_cache = response_cache or get_response_cache()
+        self.context_prompt = None
+
+        # Question and answer turns, the play context is kept apart from them
+        self.history = []
+        self.context_history = []
+        self.cached_content = None
+        self.cached_content_expires_at = None
+
+        # Vertex AI refuses to cache contexts below this many tokens. A single
+        # compacted play stays far below it, so in practice the context is
+        # sent with every question and only its compaction saves tokens.
+        self.min_cached_tokens = 32768
+        self.cache_ttl_seconds = 3600
+
+        self.system_instruction = f"""
         You are a baseball analyst providing real-time insights into the 
         strategy and tactics behind each play in a baseball game. Your goal 
         is to to help users with any query that they may have about a given 
@@ -53,18 +119,171 @@ class VertexAIChat:
         Also avoid using Ai like  jargons such as "let's break down the problem"
         etc. Directly start with the response to the user's query.
         """
-        
-        self.chat = self.client.chats.create(
-            model='gemini-2.0-flash-exp', 
-            #history=st.session_state.chat_messages,
-            config=types.GenerateContentConfig(
-                system_instruction=system_instruction,
+
+        if chat is not None:
+            self.chat = chat
+            self.client = None
+            return
+
+        self.client = get_genai_client()
+
+        if play_data is not None:
+            self.set_play_context(play_data, play_summary)
+
+        self.chat = self._create_chat()
+
+
+    def set_play_context(self, play_data, play_summary):
+        if isinstance(play_data, dict):
+            play_data = MLBPlayUtils().compact_play_for_prompt(play_data)
+
+        context_prompt = f"""
+        Here are the details of the play:
+        {play_data}\n\n
+
+        Here is the overall summary of the game:
+        {play_summary}\n\n
+
+        Answer the questions that follow based on the above information.
+        """
+        self.context_prompt = context_prompt
+        self.context_content = types.Content(role="user", parts=[types.Part(text=context_prompt)])
+        self.context_history = [
+            self.context_content,
+            types.Content(role="model", parts=[types.Part(text="Got it. What would you like to know about this play?")]),
+        ]
+
+        # The play context is cached on Vertex AI only when it is large enough
+        # to be cached. Otherwise it is a leading turn of the chat, and since
+        # the API is stateless it is sent again with every question, along
+        # with the bounded history.
+        estimated_tokens = MLBPlayUtils().estimate_prompt_tokens(self.system_instruction + context_prompt)
+
+        if estimated_tokens >= self.min_cached_tokens:
+            self._create_context_cache()
+
+
+    def _create_context_cache(self):
+        try:
+            cached_content = self.client.caches.create(
+                model=self.model,
+                config=types.CreateCachedContentConfig(
+                    contents=[self.context_content],
+                    system_instruction=self.system_instruction,
+                    ttl=f"{self.cache_ttl_seconds}s",
+                ),
+            )
+            self.cached_content = cached_content.name
+            self.cached_content_expires_at = time.time() + self.cache_ttl_seconds
+
+        except Exception as error:
+            print(f"ERROR: {error}")
+            self.cached_content = None
+            self.cached_content_expires_at = None
+
+
+    def close(self):
+        # Cached contents are billed until they expire, so they are deleted
+        # as soon as the session is dropped
+        if self.cached_content:
+            try:
+                self.client.caches.delete(name=self.cached_content)
+
+            except Exception as error:
+                print(f"ERROR: {error}")
+
+            self.cached_content = None
+            self.cached_content_expires_at = None
+
+
+    def _create_chat(self):
+        # A cache about to lapse is created again, a minute is left for the question
+        if self.cached_content and time.time() >= self.cached_content_expires_at - 60:
+            self.close()
+            self._create_context_cache()
+
+        if self.cached_content:
+            config = types.GenerateContentConfig(
+                cached_content=self.cached_content,
+                temperature=0.5,
+            )
+        else:
+            config = types.GenerateContentConfig(
+                system_instruction=self.system_instruction,
                 temperature=0.5,
-            ),
+            )
+
+        # Chats are created locally, so a fresh one per question keeps the
+        # history bounded without any extra round-trip
+        return self.client.chats.create(
+            model=self.model,
+            history=([] if self.cached_content else self.context_history) + self.history[-2 * self.max_history_turns:],
+            config=config,
         )
-    
-    def ask_gemini_questions_about_play(self, user_query, play_data, play_summary):
-        prompt = f"""
+
+
+    def _remember_turn(self, user_query, answer):
+        self.history.extend([
+            types.Content(role="user", parts=[types.Part(text=user_query)]),
+            types.Content(role="model", parts=[types.Part(text=answer)]),
+        ])
+        self.history = self.history[-2 * self.max_history_turns:]
+
+
+    def get_history(self):
+        return [(content.role, content.parts[0].text) for content in self.history]
+
+
+    def _make_cache_key(self, prompt, history):
+        return self.response_cache.make_key(
+            self.model,
+            prompt,
+            {
+                "system_instruction": self.system_instruction,
+                "context": self.context_prompt,
+                "history": [(content.role, content.parts[0].text) for content in history],
+                "temperature": 0.5,
+            },
+        )
+
+
+    def ask_question(self, user_query):
+        cache_key = self._make_cache_key(user_query, self.history[-2 * self.max_history_turns:])
+
+        def send_message():
+            chat = self._create_chat() if self.client else self.chat
+            return chat.send_message(user_query).text
+
+        answer = self.response_cache.get_or_compute(cache_key, send_message, validate=_is_answer)
+
+        self._remember_turn(user_query, answer)
+        return answer
+
+
+    def ask_question_stream(self, user_query):
+        cache_key = self._make_cache_key(user_query, self.history[-2 * self.max_history_turns:])
+
+        def send_message_stream():
+            chat = self._create_chat() if self.client else self.chat
+
+            # Chunks are handed out as they arrive, so the first words show up
+            # long before the whole answer has been generated
+            for chunk in chat.send_message_stream(user_query):
+                if chunk.text:
+                    yield chunk.text
+
+        answer_chunks = []
+
+        for chunk in self.response_cache.get_or_compute_stream(cache_key, send_message_stream, validate=_is_answer):
+            answer_chunks.append(chunk)
+            yield chunk
+
+        answer = "".join(answer_chunks)
+        self._remember_turn(user_query, answer)
+
+
+    def _build_play_question_prompt(self, user_query, play_data, play_summary):
+        return f"""
         Here are the details of the play:
         {play_data}\n\n
 
@@ -74,32 +293,92 @@ class VertexAIChat:
         Based on the above information, answer the following question:
         {user_query}
         """
-        response = self.chat.send_message(prompt)
 
-        #st.session_state.chat_messages.append({"role": "user", "content": prompt})
-        #st.session_state.chat_messages.append({"role": "assistant", "content": response})
 
-        return response.text
+    def ask_gemini_questions_about_play(self, user_query, play_data, play_summary):
+        prompt = self._build_play_question_prompt(user_query, play_data, play_summary)
+        cache_key = self.response_cache.make_key(
+            self.model, prompt, {"system_instruction": self.system_instruction, "temperature": 0.5}
+        )
+
+        return self.response_cache.get_or_compute(
+            cache_key, lambda: self.chat.send_message(prompt).text, validate=_is_answer
+        )
+
+
+    def ask_gemini_questions_about_play_stream(self, user_query, play_data, play_summary):
+        prompt = self._build_play_question_prompt(user_query, play_data, play_summary)
+
+        for chunk in self.chat.send_message_stream(prompt):
+            if chunk.text:
+                yield chunk.text
+
+
+
+class PlayChatSessions:
+    def __init__(self, max_sessions=256, max_history_turns=6):
+        self.max_sessions = max_sessions
+        self.max_history_turns = max_history_turns
+
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+
+
+    def get_session(self, username, play_id, play_data, play_summary):
+        session_key = (username, play_id)
+
+        evicted_sessions = []
+
+        # Built under the lock, so two reruns of the same session never
+        # create two chats (and two cached contexts)
+        with self.lock:
+            session = self.sessions.get(session_key)
+
+            if session is not None:
+                self.sessions.move_to_end(session_key)
+                return session
+
+            session = VertexAIChat(
+                play_data=play_data,
+                play_summary=play_summary,
+                max_history_turns=self.max_history_turns,
+            )
+            self.sessions[session_key] = session
+
+            while len(self.sessions) > self.max_sessions:
+                evicted_sessions.append(self.sessions.popitem(last=False)[1])
+
+        for evicted_session in evicted_sessions:
+            evicted_session.close()
+
+        return session
 
 
 
 class VertexAIFreeform:
-    def __init__(self):
-        credentials = service_account.Credentials.from_service_account_file(
-            "config/vertexai_service_account_key.json", 
-            scopes=["https://www.googleapis.com/auth/cloud-platform"]
-        )
-        credentials.refresh(Request())
+    def __init__(self, response_cache=None):
+        self.client = get_genai_client()
+        self.response_cache = response_cache or get_response_cache()
 
-        self.client = genai.Client(
-            vertexai=True, 
-            project='project-mlb-tool-tips', 
-            location='us-central1',
-            credentials=credentials,
-        )
+
+    def count_prompt_tokens(self, play_data):
+        mlb_play_utils = MLBPlayUtils()
+        token_report = mlb_play_utils.get_prompt_token_report(play_data)
+
+        # Exact counts from the model tokenizer, at the cost of two requests
+        for key, prompt_data in [('raw_tokens', str(play_data)), ('compact_tokens', mlb_play_utils.compact_play_for_prompt(play_data))]:
+            token_report[key] = self.client.models.count_tokens(
+                model="gemini-2.0-flash-exp",
+                contents=[prompt_data],
+            ).total_tokens
+
+        return token_report
 
 
     def generate_play_by_play_summary(self, play_data):
+        if isinstance(play_data, dict):
+            play_data = MLBPlayUtils().compact_play_for_prompt(play_data)
+
         system_instruction = """
         You are a baseball analyst providing real-time insights into the 
         strategy and tactics behind each play in a baseball game. Your goal 
@@ -183,43 +462,36 @@ class VertexAIFreeform:
             system_instruction=system_instruction,
         )
 
-        response = self.client.models.generate_content(
-            model=model,
-            contents=contents,
-            config=generate_content_config,
+        # Identical plays produce identical prompts, so concurrent viewers and
+        # the worker share a single upstream call and its cached answer
+        cache_key = self.response_cache.make_key(
+            model, prompt, generate_content_config.model_dump(mode="json", exclude_none=True)
         )
 
-        return response.text        
+        def generate_content():
+            response = self.client.models.generate_content(
+                model=model,
+                contents=contents,
+                config=generate_content_config,
+            )
+            return response.text
+
+        return self.response_cache.get_or_compute(cache_key, generate_content, validate=_is_play_summary)
 
 
 class VertexAIVision:
     def __init__(self):
-        credentials = service_account.Credentials.from_service_account_file(
-            "config/vertexai_service_account_key.json", 
-            scopes=["https://www.googleapis.com/auth/cloud-platform"]
-        )
-        credentials.refresh(Request())
-
-        self.client = genai.Client(
-            vertexai=True, 
-            project='project-mlb-tool-tips', 
-            location='us-central1',
-            credentials=credentials,
-        )
-
-        vertexai.init(
-            project='project-mlb-tool-tips', 
-            location='us-central1',
-            credentials=credentials,
-        )
+        self.client = get_genai_client()
+        init_vertexai()
 
     
-    def generate_play_banner(self, play_description):
+    def generate_play_banners(self, play_description, number_of_images=1):
+        # Imagen returns up to four variations of one prompt in a single request
         model = ImageGenerationModel.from_pretrained("imagen-3.0-generate-002")
 
         images = model.generate_images(
             prompt=play_description,
-            number_of_images=1,
+            number_of_images=number_of_images,
             language="en",
             aspect_ratio="1:1",
             safety_filter_level='block_some',
@@ -228,11 +500,26 @@ class VertexAIVision:
         )
 
         #images[0].save(location="test2.png", include_generation_parameters=False)
-        return images[0]._image_bytes
+        return [image._image_bytes for image in images]
+
+
+    def generate_play_banner(self, play_description):
+        images = self.generate_play_banners(play_description, number_of_images=1)
+
+        # Prompts blocked by the safety filter come back without an image
+        if not images:
+            raise ValueError("Imagen returned no image for the prompt")
+
+        return images[0]
 
 
 
 if __name__ == "__main__":
+    fake_chat = VertexAIChat(chat=FakeGeminiChat(), response_cache=ResponseCache())
+    for chunk in fake_chat.ask_question_stream("Why did the batter swing?"):
+        print(chunk, end="", flush=True)
+    print()
+
     vi = VertexAIVision()
     ans = vi.generate_play_banner("A baseball field illustration of Michael Conforto grounding into a double play against Steven Matz. The first baseman, Alec Burleson, is fielding the ball, with Thomas Saggese covering second base. Donovan Walton is advancing to third.")
     print(ans)
\ No newline at end of file
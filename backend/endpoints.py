@@ -1,11 +1,258 @@
+import os
+import copy
 import json
+import time
+import threading
 import requests
+import requests.adapters
 import pandas as pd
 from datetime import datetime
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
-from google.cloud import translate_v3
-from google.oauth2 import service_account
-from google.auth.transport.requests import Request
+from backend.clients import get_translation_client
+
+
+
+# A single keep-alive session and response cache shared by every MLBStatsAPI
+# instance, so Streamlit reruns reuse both the connection and the payloads
+_http_session = requests.Session()
+_http_session.mount(
+    "https://",
+    requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=16),
+)
+
+_http_cache = OrderedDict()
+_http_cache_lock = threading.Lock()
+_http_cache_max_entries = 128
+
+# Live feeds kept up to date through the diffPatch endpoint, keyed by game_pk
+_live_feeds = OrderedDict()
+_live_feeds_lock = threading.Lock()
+_live_feeds_max_games = 32
+
+# (ETag, Last-Modified) of the last full live feed fetched for each game above
+_live_feed_validators = {}
+
+# Compact views of the live feeds handed to the UI, one per game and version
+_compact_live_feeds = OrderedDict()
+
+SCHEDULE_TTL = 5 * 60
+LIVE_GAMES_TTL = 30
+TEAMS_TTL = 24 * 60 * 60
+SEASON_SCHEDULE_TTL = 60 * 60
+GAME_CONTENT_TTL = 10 * 60
+
+# Season schedules, as typed tables kept in memory and as Parquet on disk
+_season_schedules = {}
+_season_schedules_lock = threading.Lock()
+
+SEASON_SCHEDULE_CACHE_DIR = ".cache/mlb_schedules"
+
+# Player headshots, so switching tabs or teams does not download them again.
+# Players without a headshot (404) are remembered as None, other failures
+# (429, 5xx) are not remembered so the next render tries again.
+_headshots = OrderedDict()
+_headshots_lock = threading.Lock()
+_headshots_max_entries = 512
+
+HEADSHOT_URL = "https://securea.mlb.com/mlb/images/players/head_shot/{player_id}.jpg"
+
+
+
+def _decode_json_pointer(pointer):
+    if not pointer:
+        return []
+
+    return [token.replace("~1", "/").replace("~0", "~") for token in pointer.split("/")[1:]]
+
+
+def _json_pointer_key(container, token):
+    if isinstance(container, list):
+        return len(container) if token == "-" else int(token)
+
+    return token
+
+
+def _resolve_json_pointer(document, pointer):
+    value = document
+
+    for token in _decode_json_pointer(pointer):
+        value = value[_json_pointer_key(value, token)]
+
+    return value
+
+
+def _apply_json_patch(document, operations):
+    # RFC 6902 patch applied copy-on-write: only the containers along patched
+    # paths are copied, so readers still holding the old feed never see a
+    # half-applied patch and the rest of the tree is shared, not duplicated
+    root = [document]
+    copied_containers = set()
+
+    def writable(parent, key):
+        child = parent[key]
+
+        if id(child) not in copied_containers:
+            child = copy.copy(child)
+            copied_containers.add(id(child))
+            parent[key] = child
+
+        return child
+
+    def writable_parent(tokens):
+        container = writable(root, 0)
+
+        for token in tokens[:-1]:
+            container = writable(container, _json_pointer_key(container, token))
+
+        return container
+
+    def add(tokens, value):
+        if not tokens:
+            root[0] = value
+            return
+
+        container = writable_parent(tokens)
+        key = _json_pointer_key(container, tokens[-1])
+
+        if isinstance(container, list):
+            container.insert(key, value)
+        else:
+            container[key] = value
+
+    def remove(tokens):
+        container = writable_parent(tokens)
+        del container[_json_pointer_key(container, tokens[-1])]
+
+    for operation in operations:
+        op = operation["op"]
+        tokens = _decode_json_pointer(operation["path"])
+
+        if op == "add":
+            add(tokens, operation["value"])
+
+        elif op == "remove":
+            remove(tokens)
+
+        elif op == "replace":
+            if not tokens:
+                root[0] = operation["value"]
+            else:
+                container = writable_parent(tokens)
+                container[_json_pointer_key(container, tokens[-1])] = operation["value"]
+
+        elif op == "move":
+            value = _resolve_json_pointer(root[0], operation["from"])
+            remove(_decode_json_pointer(operation["from"]))
+            add(tokens, value)
+
+        elif op == "copy":
+            add(tokens, copy.deepcopy(_resolve_json_pointer(root[0], operation["from"])))
+
+        elif op == "test":
+            if _resolve_json_pointer(root[0], operation["path"]) != operation["value"]:
+                raise ValueError(f"JSON patch test failed at {operation['path']}")
+
+        else:
+            raise ValueError(f"Unsupported JSON patch operation: {op}")
+
+    return root[0]
+
+
+
+def _pick(data, keys):
+    return {key: data[key] for key in keys if key in data}
+
+
+def _compact_play_event(play_event):
+    compact_event = _pick(play_event, ['isPitch', 'playId', 'type', 'pitchNumber', 'count', 'hitData'])
+    compact_event['details'] = _pick(
+        play_event.get('details', {}),
+        ['description', 'event', 'eventType', 'call', 'type', 'isInPlay', 'isStrike', 'isBall', 'isOut'],
+    )
+
+    if 'pitchData' in play_event:
+        pitch_data = play_event['pitchData']
+        compact_event['pitchData'] = _pick(pitch_data, ['startSpeed', 'endSpeed', 'zone'])
+        compact_event['pitchData']['breaks'] = _pick(pitch_data.get('breaks', {}), ['spinRate'])
+
+    return compact_event
+
+
+def _compact_play(play):
+    compact_play = _pick(play, ['result', 'about', 'count'])
+
+    matchup = play.get('matchup', {})
+    compact_play['matchup'] = _pick(matchup, ['batter', 'pitcher', 'batSide', 'pitchHand', 'splits'])
+
+    compact_play['playEvents'] = [_compact_play_event(play_event) for play_event in play.get('playEvents', [])]
+    compact_play['runners'] = [
+        {
+            'movement': runner.get('movement', {}),
+            'details': _pick(runner.get('details', {}), ['event', 'runner', 'isScoringEvent', 'rbi', 'earned']),
+        }
+        for runner in play.get('runners', [])
+    ]
+
+    return compact_play
+
+
+def _compact_live_feed(live_feed, max_plays=None):
+    # Keeps only what the UI reads: game headers, linescore, rosters and the
+    # plays. Players, playsByInning, officials, decisions and all per-pitch
+    # tracking coordinates are left out.
+    game_data = live_feed.get('gameData', {})
+    live_data = live_feed.get('liveData', {})
+
+    compact_teams = {}
+    compact_boxscore_teams = {}
+
+    for team_type in ['away', 'home']:
+        compact_teams[team_type] = _pick(
+            game_data.get('teams', {}).get(team_type, {}),
+            ['id', 'name', 'teamName', 'abbreviation', 'clubName'],
+        )
+
+        boxscore_team = live_data.get('boxscore', {}).get('teams', {}).get(team_type, {})
+        compact_boxscore_teams[team_type] = {
+            'battingOrder': boxscore_team.get('battingOrder', []),
+            'players': {
+                player_key: {
+                    'person': _pick(player.get('person', {}), ['id', 'fullName']),
+                    'jerseyNumber': player.get('jerseyNumber', ''),
+                    'position': _pick(player.get('position', {}), ['abbreviation', 'name']),
+                    'battingOrder': player.get('battingOrder'),
+                }
+                for player_key, player in boxscore_team.get('players', {}).items()
+            },
+        }
+
+    all_plays = live_data.get('plays', {}).get('allPlays', [])
+
+    if max_plays:
+        all_plays = all_plays[-max_plays:]
+
+    venue = game_data.get('venue', {})
+
+    return {
+        'gamePk': live_feed.get('gamePk'),
+        'metaData': _pick(live_feed.get('metaData', {}), ['timeStamp']),
+        'gameData': {
+            'status': game_data.get('status', {}),
+            'datetime': game_data.get('datetime', {}),
+            'teams': compact_teams,
+            'venue': {
+                'name': venue.get('name'),
+                'location': _pick(venue.get('location', {}), ['city', 'stateAbbrev']),
+            },
+        },
+        'liveData': {
+            'linescore': _pick(live_data.get('linescore', {}), ['innings', 'teams', 'currentInning', 'inningHalf']),
+            'boxscore': {'teams': compact_boxscore_teams},
+            'plays': {'allPlays': [_compact_play(play) for play in all_plays]},
+        },
+    }
 
 
 
@@ -14,28 +261,206 @@ class MLBStatsAPI:
         pass
 
 
-    def get_mlb_live_feed(self, game_pk):    
+    def _get_json(self, url, ttl=0, extract=None):
+        # ttl is in seconds, or a function of the cached payload for endpoints
+        # whose freshness depends on the content (e.g. finished games)
+        with _http_cache_lock:
+            cache_entry = _http_cache.get(url)
+
+            if cache_entry:
+                _http_cache.move_to_end(url)
+
+        headers = {}
+
+        if cache_entry:
+            entry_ttl = ttl(cache_entry["data"]) if callable(ttl) else ttl
+
+            if time.monotonic() - cache_entry["fetched_at"] < entry_ttl:
+                return cache_entry["data"]
+
+            if cache_entry["etag"]:
+                headers["If-None-Match"] = cache_entry["etag"]
+
+            if cache_entry["last_modified"]:
+                headers["If-Modified-Since"] = cache_entry["last_modified"]
+
+        try:
+            response = _http_session.get(url, headers=headers, timeout=30)
+
+        except requests.RequestException as error:
+            print(f"ERROR: {error}")
+            return cache_entry["data"] if cache_entry else None
+
+        if response.status_code == 304 and cache_entry:
+            cache_entry["fetched_at"] = time.monotonic()
+            return cache_entry["data"]
+
+        if response.status_code != 200:
+            # A stale answer beats none while the API is failing
+            return cache_entry["data"] if cache_entry else None
+
+        data = json.loads(response.content)
+
+        if extract:
+            data = extract(data)
+
+        with _http_cache_lock:
+            _http_cache[url] = {
+                "data": data,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "fetched_at": time.monotonic(),
+            }
+            _http_cache.move_to_end(url)
+
+            while len(_http_cache) > _http_cache_max_entries:
+                _http_cache.popitem(last=False)
+
+        return data
+
+
+    def _live_feed_ttl(self, data):
+        game_state = data.get("gameData", {}).get("status", {}).get("abstractGameState")
+
+        # Finished games never change, live ones are always revalidated
+        return float("inf") if game_state == "Final" else 0
+
+
+    def _remember_live_feed(self, game_pk, live_feed, validators=None):
+        with _live_feeds_lock:
+            _live_feeds[game_pk] = live_feed
+            _live_feeds.move_to_end(game_pk)
+
+            if validators is not None:
+                _live_feed_validators[game_pk] = validators
+
+            while len(_live_feeds) > _live_feeds_max_games:
+                evicted_game_pk, _ = _live_feeds.popitem(last=False)
+                _live_feed_validators.pop(evicted_game_pk, None)
+
+
+    def get_mlb_live_feed(self, game_pk):
+        # Not kept in the HTTP cache, the body is held once in _live_feeds and
+        # only its ETag / Last-Modified are kept to revalidate it
+        game_pk = str(game_pk)
         url = f"https://statsapi.mlb.com/api/v1.1/game/{game_pk}/feed/live"
-        response = requests.get(url)
 
-        if response.status_code == 200:
-            json_response = response.content
-            data = json.loads(json_response)
-            return data
-        
+        with _live_feeds_lock:
+            live_feed = _live_feeds.get(game_pk)
+            validators = _live_feed_validators.get(game_pk) if live_feed is not None else None
+
+        if live_feed is not None and self._live_feed_ttl(live_feed):
+            return live_feed
+
+        headers = {}
+
+        if validators:
+            etag, last_modified = validators
+
+            if etag:
+                headers["If-None-Match"] = etag
+
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+        try:
+            response = _http_session.get(url, headers=headers, timeout=30)
+
+        except requests.RequestException as error:
+            print(f"ERROR: {error}")
+            return live_feed
+
+        if response.status_code != 200:
+            # 304, or a stale feed while the API is failing
+            return live_feed
+
+        live_feed = json.loads(response.content)
+        self._remember_live_feed(
+            game_pk, live_feed, (response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        )
+
+        return live_feed
+
+    
+    def get_mlb_live_feed_incremental(self, game_pk):
+        game_pk = str(game_pk)
+
+        with _live_feeds_lock:
+            live_feed = _live_feeds.get(game_pk)
+
+        if live_feed is None:
+            live_feed = self.get_mlb_live_feed(game_pk)
+
+        elif self._live_feed_ttl(live_feed):
+            # Finished games are never patched again
+            return live_feed
+
         else:
+            time_stamp = live_feed.get("metaData", {}).get("timeStamp")
+            url = f"https://statsapi.mlb.com/api/v1.1/game/{game_pk}/feed/live/diffPatch?startTimecode={time_stamp}"
+
+            try:
+                response = _http_session.get(url, timeout=30)
+                response.raise_for_status()
+                data = json.loads(response.content)
+
+                # The endpoint answers with the full feed when the delta would
+                # be too large, and with a list of patches (empty if nothing
+                # changed since the time stamp) otherwise
+                if isinstance(data, dict):
+                    live_feed = data
+
+                else:
+                    for patch in data:
+                        live_feed = _apply_json_patch(live_feed, patch.get("diff", []))
+
+            except Exception as error:
+                print(f"ERROR: {error}")
+                live_feed = self.get_mlb_live_feed(game_pk)
+
+        if live_feed is None:
             return None
-        
-    
+
+        self._remember_live_feed(game_pk, live_feed)
+
+        return live_feed
+
+
+    def get_mlb_live_feed_compact(self, game_pk, max_plays=None):
+        live_feed = self.get_mlb_live_feed_incremental(game_pk)
+
+        if live_feed is None:
+            return None
+
+        # Every session viewing the game shares the compact view of a version
+        version = (live_feed.get("metaData", {}).get("timeStamp"), max_plays)
+        cache_key = (str(game_pk), max_plays)
+
+        with _live_feeds_lock:
+            cache_entry = _compact_live_feeds.get(cache_key)
+
+        if cache_entry and cache_entry[0] == version:
+            return cache_entry[1]
+
+        compact_live_feed = _compact_live_feed(live_feed, max_plays)
+
+        with _live_feeds_lock:
+            _compact_live_feeds[cache_key] = (version, compact_live_feed)
+            _compact_live_feeds.move_to_end(cache_key)
+
+            while len(_compact_live_feeds) > _live_feeds_max_games:
+                _compact_live_feeds.popitem(last=False)
+
+        return compact_live_feed
+
+
     def get_mlb_schedule(self, date):
         url = f"""https://statsapi.mlb.com/api/v1/schedule?sportId=1&date={date.strftime("%Y-%m-%d")}"""
 
-        response = requests.get(url)
+        data = self._get_json(url, ttl=SCHEDULE_TTL)
 
-        if response.status_code != 200:
+        if data is None:
             return None
-        
-        data = response.json()
 
         matches = {}
 
@@ -49,33 +474,129 @@ class MLBStatsAPI:
                     matches[f"{away_team} vs {home_team}"] = game_pk
 
         return matches
+
+
+    def get_live_games(self, date):
+        url = f"""https://statsapi.mlb.com/api/v1/schedule?sportId=1&date={date.strftime("%Y-%m-%d")}"""
+
+        data = self._get_json(url, ttl=LIVE_GAMES_TTL)
+
+        if data is None:
+            return []
+
+        live_games = []
+
+        for date_data in data.get("dates", []):
+            for game in date_data.get("games", []):
+                if game.get("status", {}).get("abstractGameState") == "Live":
+                    live_games.append(game["gamePk"])
+
+        return live_games
     
 
-    def get_mlb_season_schedule(self, year=2025):
+    def _build_season_schedule_table(self, data):
+        columns = {
+            'Game Pk': [],
+            'Game Date': [],
+            'Away Team': [],
+            'Home Team': [],
+            'Venue': [],
+            'Status': [],
+        }
+
+        for date_data in data.get('dates', []):
+            for game in date_data.get('games', []):
+                columns['Game Pk'].append(game.get('gamePk'))
+                columns['Game Date'].append(game.get('officialDate', date_data.get('date')))
+                columns['Away Team'].append(game.get('teams', {}).get('away', {}).get('team', {}).get('name'))
+                columns['Home Team'].append(game.get('teams', {}).get('home', {}).get('team', {}).get('name'))
+                columns['Venue'].append(game.get('venue', {}).get('name'))
+                columns['Status'].append(game.get('status', {}).get('abstractGameState'))
+
+        return self._categorize_season_schedule(pd.DataFrame({
+            'Game Pk': pd.Series(columns['Game Pk'], dtype='int64'),
+            'Game Date': pd.to_datetime(pd.Series(columns['Game Date'], dtype='object')),
+            'Away Team': columns['Away Team'],
+            'Home Team': columns['Home Team'],
+            'Venue': columns['Venue'],
+            'Status': columns['Status'],
+        }))
+
+
+    def _categorize_season_schedule(self, table):
+        # Team and venue names repeat thousands of times over a season
+        for column in ['Away Team', 'Home Team', 'Venue', 'Status']:
+            table[column] = table[column].astype('category')
+
+        return table
+
+
+    def _load_season_schedule_table(self, year):
+        cache_path = os.path.join(SEASON_SCHEDULE_CACHE_DIR, f"{year}.parquet")
         endpoint_url = f'https://statsapi.mlb.com/api/v1/schedule?sportId=1&season={year}'
-        pop_key = "dates"
 
-        json_result = requests.get(endpoint_url).content
-        data = json.loads(json_result)
-        if pop_key:
-            schedule_dates = pd.json_normalize(data.pop(pop_key), sep = '_')
+        table = pd.read_parquet(cache_path) if os.path.exists(cache_path) else None
+
+        # An empty season (not published yet, or a bad answer) is always fetched again in full
+        if table is None or table.empty:
+            table = self._get_json(endpoint_url, ttl=SEASON_SCHEDULE_TTL, extract=self._build_season_schedule_table)
+
         else:
-            schedule_dates = pd.json_normalize(data)
-        
-        games = pd.json_normalize(
-            schedule_dates.explode('games').reset_index(drop = True)['games']
-        )
+            pending_dates = table.loc[table['Status'] != 'Final', 'Game Date']
+
+            # Finished games never change, only dates from the first game that
+            # was not final at the last load onwards are fetched again
+            if pending_dates.empty:
+                return table
+
+            start_date = pending_dates.min().strftime("%Y-%m-%d")
+            end_date = table['Game Date'].max().strftime("%Y-%m-%d")
 
-        sub_games = games[['officialDate', 'teams.away.team.name', 'teams.home.team.name', 'venue.name']]
+            updated_table = self._get_json(
+                f"{endpoint_url}&startDate={start_date}&endDate={end_date}",
+                ttl=SEASON_SCHEDULE_TTL,
+                extract=self._build_season_schedule_table,
+            )
 
-        sub_games.rename(columns={
-            'officialDate': 'Game Date',
-            'teams.away.team.name': 'Away Team',
-            'teams.home.team.name': 'Home Team',
-            'venue.name': 'Venue'
-            }, inplace=True)
+            if updated_table is None:
+                return table
 
-        return sub_games
+            # Categories differ between the two parts, so they are rebuilt
+            table = self._categorize_season_schedule(pd.concat(
+                [table[table['Game Date'] < pending_dates.min()], updated_table],
+                ignore_index=True,
+            ))
+
+        if table is None or table.empty:
+            return table
+
+        os.makedirs(SEASON_SCHEDULE_CACHE_DIR, exist_ok=True)
+        table.to_parquet(f"{cache_path}.tmp", engine="pyarrow", index=False)
+        os.replace(f"{cache_path}.tmp", cache_path)
+
+        return table
+
+
+    def get_mlb_season_schedule(self, year=2025):
+        year = int(year)
+
+        with _season_schedules_lock:
+            cache_entry = _season_schedules.get(year)
+
+        if cache_entry and time.monotonic() - cache_entry[0] < SEASON_SCHEDULE_TTL:
+            table = cache_entry[1]
+
+        else:
+            table = self._load_season_schedule_table(year)
+
+            if table is None:
+                return None
+
+            if not table.empty:
+                with _season_schedules_lock:
+                    _season_schedules[year] = (time.monotonic(), table)
+
+        return table[['Game Date', 'Away Team', 'Home Team', 'Venue']]
 
 
     def get_all_teams(self, only_mlb=True):
@@ -83,11 +604,9 @@ class MLBStatsAPI:
         if only_mlb:
             url = url + "?sportId=1"
 
-        response = requests.get(url)
-        if response.status_code != 200:
+        data = self._get_json(url, ttl=TEAMS_TTL)
+        if data is None:
             return None
-        
-        data = response.json()
 
         try:
             team_data = json.loads(data) if isinstance(data, str) else data
@@ -107,16 +626,7 @@ class MLBStatsAPI:
             return {}
 
 
-    def get_game_highlight_videos(self, game_pk):
-        url = f"https://statsapi.mlb.com/api/v1/game/{game_pk}/content"
-        response = requests.get(url)
-
-        if response.status_code == 200:
-            json_response = response.content
-            data = json.loads(json_response)
-        else:
-            return None
-
+    def _extract_game_highlight_videos(self, data):
         game_highlights = {}
 
         for item in data.get('highlights').get('highlights').get('items'):
@@ -127,44 +637,148 @@ class MLBStatsAPI:
                     if pb_video.get('name') == 'highBit':
                         game_highlights[headline] = pb_video.get('url')
 
-        del response
         return game_highlights
 
 
-class CloudTranslationAPI:
-    def __init__(self):
-        credentials = service_account.Credentials.from_service_account_file(
-            "config/cloud_translation_api_admin_service_account_key.json", 
-            scopes=["https://www.googleapis.com/auth/cloud-platform"]
-        )
-        credentials.refresh(Request())
+    def get_game_highlight_videos(self, game_pk):
+        url = f"https://statsapi.mlb.com/api/v1/game/{game_pk}/content"
 
-        self.client = translate_v3.TranslationServiceClient(credentials=credentials)
+        # Only the extracted highlights are cached, not the full content tree
+        return self._get_json(url, ttl=GAME_CONTENT_TTL, extract=self._extract_game_highlight_videos)
 
 
-    def translate_text(self, text, language):        
-        if language.lower() == "english":
-            return text
-        
-        parent = f"projects/project-mlb-tool-tips/locations/global"
+    def get_player_headshot(self, player_id):
+        with _headshots_lock:
+            if player_id in _headshots:
+                _headshots.move_to_end(player_id)
+                return _headshots[player_id]
+
+        try:
+            response = _http_session.get(HEADSHOT_URL.format(player_id=player_id), timeout=10)
+
+        except requests.RequestException as error:
+            # Not remembered, the next render tries again
+            print(f"ERROR: {error}")
+            return None
+
+        if response.status_code == 200:
+            headshot = response.content
+
+        elif response.status_code == 404:
+            headshot = None
+
+        else:
+            return None
+
+        with _headshots_lock:
+            _headshots[player_id] = headshot
+            _headshots.move_to_end(player_id)
+
+            while len(_headshots) > _headshots_max_entries:
+                _headshots.popitem(last=False)
+
+        return headshot
+
 
-        language_codes = {
+    def get_player_headshots(self, player_ids):
+        # A whole lineup is downloaded in parallel on the first view
+        with ThreadPoolExecutor(max_workers=8, thread_name_prefix="headshots") as executor:
+            return dict(zip(player_ids, executor.map(self.get_player_headshot, player_ids)))
+
+
+class CloudTranslationAPI:
+    def __init__(self):
+        self.client = get_translation_client()
+
+        self.parent = f"projects/project-mlb-tool-tips/locations/global"
+
+        self.language_codes = {
             "english": "en",
             "spanish": "es",
             "japanese": "ja",
             "hindi": "hi",
         }
 
+        # Limits of a single translate_text request in the v3 API
+        self.max_contents_per_request = 1024
+        self.max_codepoints_per_request = 30000
+
+
+    def translate_text(self, text, language):        
+        if language.lower() == "english":
+            return text
+
         response = self.client.translate_text(
             contents=[text],
-            target_language_code=language_codes[language.lower()],
-            parent=parent,
+            target_language_code=self.language_codes[language.lower()],
+            parent=self.parent,
             mime_type="text/plain",
         )
 
         return response.translations[0].translated_text
 
 
+    def _split_into_requests(self, keys, texts):
+        batches = []
+        batch_keys, batch_codepoints = [], 0
+
+        for key in keys:
+            text_codepoints = len(texts[key])
+
+            if batch_keys and (
+                len(batch_keys) >= self.max_contents_per_request
+                or batch_codepoints + text_codepoints > self.max_codepoints_per_request
+            ):
+                batches.append(batch_keys)
+                batch_keys, batch_codepoints = [], 0
+
+            batch_keys.append(key)
+            batch_codepoints += text_codepoints
+
+        if batch_keys:
+            batches.append(batch_keys)
+
+        return batches
+
+
+    def iter_translations(self, texts, language):
+        # Yields {key: translation} for each translate_text request, so callers
+        # keep the batches already translated when a later one fails.
+        # Empty fields are not sent to the API.
+        keys = [key for key, text in texts.items() if text]
+
+        for batch_keys in self._split_into_requests(keys, texts):
+            response = self.client.translate_text(
+                contents=[texts[key] for key in batch_keys],
+                target_language_code=self.language_codes[language.lower()],
+                parent=self.parent,
+                mime_type="text/plain",
+            )
+
+            yield {
+                key: translation.translated_text
+                for key, translation in zip(batch_keys, response.translations)
+            }
+
+
+    def translate_many(self, texts, languages):
+        # texts maps any hashable key (e.g. (play_id, field)) to the text
+        if not isinstance(texts, dict):
+            texts = dict(enumerate(texts))
+
+        translations = {}
+
+        for language in languages:
+            translations[language] = dict(texts)
+
+            if language.lower() == "english":
+                continue
+
+            for batch_translations in self.iter_translations(texts, language):
+                translations[language].update(batch_translations)
+
+        return translations
+
 
 if __name__ == "__main__":
     #mlb_stats_api = MLBStatsAPI()
@@ -173,3 +787,4 @@ if __name__ == "__main__":
 
     trans_api = CloudTranslationAPI()
     print(trans_api.translate_text("Hello there!", "spanish"))
+    print(trans_api.translate_many({"greeting": "Hello there!", "farewell": "See you soon!"}, ["spanish", "japanese"]))
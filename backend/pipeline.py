@@ -0,0 +1,503 @@
+import json
+import time
+import random
+import hashlib
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from google.api_core import exceptions as google_exceptions
+
+from backend.utils import MLBPlayUtils
+from backend.endpoints import MLBStatsAPI, CloudTranslationAPI
+from backend.completions import VertexAIFreeform, VertexAIVision
+from database.cloud_storage import MLBStorageBucket
+from database.firestore import MLBLiveFeedSummaryCollection, PlayEnrichmentLeaseCollection
+
+
+
+class RateLimiter:
+    def __init__(self, requests_per_minute=None):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+
+
+    def acquire(self):
+        if not self.interval:
+            return
+
+        with self.lock:
+            now = time.monotonic()
+            wait_time = max(0, self.next_slot - now)
+            self.next_slot = max(now, self.next_slot) + self.interval
+
+        if wait_time:
+            time.sleep(wait_time)
+
+
+
+class BannerGenerationQueue:
+    # Errors Imagen returns while over quota or overloaded, worth retrying
+    retryable_errors = (
+        google_exceptions.ResourceExhausted,
+        google_exceptions.TooManyRequests,
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.DeadlineExceeded,
+    )
+
+    def __init__(
+        self,
+        vertex_ai_vision,
+        storage_bucket,
+        rate_limiter,
+        max_workers=2,
+        max_attempts=4,
+        backoff_seconds=5,
+        fallback_variants=4,
+        banner_status_store=None,
+        retry_interval=10 * 60,
+    ):
+        # banner_status_store (MLBLiveFeedSummaryCollection) records on each
+        # play document whether its banner exists, so banners lost with the
+        # in-memory queue are generated again by the next reconciliation pass
+        self.vertex_ai_vision = vertex_ai_vision
+        self.storage_bucket = storage_bucket
+        self.rate_limiter = rate_limiter
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.fallback_variants = fallback_variants
+        self.banner_status_store = banner_status_store
+        self.retry_interval = retry_interval
+
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="banner-generation")
+        self.lock = threading.Lock()
+
+        self.play_futures = {}
+        self.image_futures = {}
+        self.fallback_futures = {}
+        self.fallback_pool = {}
+        self.failed_at = {}
+
+
+    def _generate(self, generate):
+        for attempt in range(self.max_attempts):
+            self.rate_limiter.acquire()
+
+            try:
+                return generate()
+
+            except self.retryable_errors as error:
+                if attempt == self.max_attempts - 1:
+                    raise
+
+                backoff = self.backoff_seconds * 2 ** attempt + random.uniform(0, self.backoff_seconds)
+                print(f"Imagen is throttling ({error}), retrying in {backoff:.1f}s")
+                time.sleep(backoff)
+
+
+    def submit(self, game_pk, play_id, image_prompt, fallback_key="generic"):
+        # Returns a Future of whether the play got a banner. Identical prompts
+        # waiting in the queue share a single Imagen request.
+        key = (str(game_pk), play_id)
+        prompt_digest = hashlib.sha256(str(image_prompt).encode("utf-8")).hexdigest()
+
+        with self.lock:
+            play_future = self.play_futures.get(key)
+
+            if play_future is not None:
+                return play_future
+
+            # Plays whose banner just failed wait before they are tried again
+            if time.monotonic() - self.failed_at.get(key, -self.retry_interval) < self.retry_interval:
+                play_future = Future()
+                play_future.set_result(False)
+                return play_future
+
+            play_future = Future()
+            self.play_futures[key] = play_future
+
+            image_future = self.image_futures.get(prompt_digest)
+
+            if image_future is None:
+                image_future = self.executor.submit(
+                    self._generate, lambda: self.vertex_ai_vision.generate_play_banner(image_prompt)
+                )
+                self.image_futures[prompt_digest] = image_future
+
+        image_future.add_done_callback(
+            lambda image_future: self._store(key, prompt_digest, image_future, fallback_key, play_future)
+        )
+        return play_future
+
+
+    def _store(self, key, prompt_digest, image_future, fallback_key, play_future):
+        game_pk, play_id = key
+
+        with self.lock:
+            self.image_futures.pop(prompt_digest, None)
+
+        uploaded = False
+
+        try:
+            uploaded = self.storage_bucket.upload_play_banner(game_pk, play_id, image_future.result())
+
+        except Exception as error:
+            print(f"ERROR: {error}")
+            print(f"Generating the banner of play {play_id} failed, using a fallback banner\n")
+
+        try:
+            if not uploaded:
+                uploaded = self.use_fallback_banner(game_pk, play_id, fallback_key)
+
+        except Exception as error:
+            print(f"ERROR: {error}")
+
+        try:
+            if uploaded and self.banner_status_store is not None:
+                self.banner_status_store.set_banner_status(game_pk, play_id, "done")
+
+        except Exception as error:
+            print(f"ERROR: {error}")
+
+        finally:
+            with self.lock:
+                self.play_futures.pop(key, None)
+
+                if uploaded:
+                    self.failed_at.pop(key, None)
+                else:
+                    self.failed_at[key] = time.monotonic()
+
+            play_future.set_result(uploaded)
+
+
+    def _fill_fallback_pool(self, fallback_key):
+        # All variants of a fallback come from a single Imagen request
+        description = fallback_key.replace("_", " ")
+
+        try:
+            images = self._generate(lambda: self.vertex_ai_vision.generate_play_banners(
+                f"A stylized illustration of a baseball {description} in a packed stadium, without any text or logos",
+                number_of_images=self.fallback_variants,
+            ))
+
+            if images and self.storage_bucket.upload_fallback_banners(fallback_key, images):
+                with self.lock:
+                    self.fallback_pool[fallback_key] = list(range(len(images)))
+
+        except Exception as error:
+            print(f"ERROR: {error}")
+            print(f"Generating fallback banners for {fallback_key} failed!!!\n")
+
+        finally:
+            with self.lock:
+                self.fallback_futures.pop(fallback_key, None)
+
+
+    def _get_fallback_variants(self, fallback_key):
+        with self.lock:
+            variants = self.fallback_pool.get(fallback_key)
+
+        if variants is None:
+            variants = self.storage_bucket.list_fallback_banner_variants(fallback_key)
+
+            with self.lock:
+                self.fallback_pool[fallback_key] = variants
+
+        if not variants:
+            # Generated in the background, plays that fail later get to use it
+            with self.lock:
+                if fallback_key not in self.fallback_futures:
+                    self.fallback_futures[fallback_key] = self.executor.submit(self._fill_fallback_pool, fallback_key)
+
+        return variants
+
+
+    def use_fallback_banner(self, game_pk, play_id, fallback_key="generic"):
+        for candidate_key in dict.fromkeys([fallback_key, "generic"]):
+            variants = self._get_fallback_variants(candidate_key)
+
+            if variants:
+                # The same play always gets the same variant
+                variant = variants[int(hashlib.sha256(play_id.encode("utf-8")).hexdigest(), 16) % len(variants)]
+                return self.storage_bucket.copy_fallback_banner(candidate_key, variant, game_pk, play_id)
+
+        return False
+
+
+    def join(self):
+        with self.lock:
+            play_futures = list(self.play_futures.values())
+
+        for play_future in play_futures:
+            play_future.result()
+
+
+
+class PlaySummaryPipeline:
+    def __init__(self, max_concurrent_plays=8, gemini_rpm=60, translation_rpm=300, imagen_rpm=20, leases=None):
+        self.mlb_stats_api = MLBStatsAPI()
+        self.mlb_play_utils = MLBPlayUtils()
+        self.vertex_ai_freeform = VertexAIFreeform()
+        self.vertex_ai_vision = VertexAIVision()
+        self.cloud_translation_api = CloudTranslationAPI()
+        self.mlb_storage_bucket = MLBStorageBucket()
+        self.mlb_live_feed_collection = MLBLiveFeedSummaryCollection()
+
+        # One lease per (game_pk, play_id) across every worker process
+        self.leases = leases or PlayEnrichmentLeaseCollection()
+        self.lease_poll_interval = 2
+        self.lease_wait_timeout = 600
+        self.lease_renew_interval = 60
+
+        self.summarized_plays = {}
+
+        self.translated_fields = [
+            'outcome',
+            'overall_strategy_insights',
+            'setup',
+            'summary_of_play_events',
+            'title',
+        ]
+        self.translated_languages = ['Spanish', 'Japanese', 'Hindi']
+
+        self.max_concurrent_plays = max_concurrent_plays
+        self.rate_limiters = {
+            'gemini': RateLimiter(gemini_rpm),
+            'translation': RateLimiter(translation_rpm),
+            'imagen': RateLimiter(imagen_rpm),
+        }
+
+        # Translation steps run on their own pool, so that play tasks waiting
+        # on them can never starve the pool they are running on
+        self.step_executor = ThreadPoolExecutor(
+            max_workers=max_concurrent_plays * len(self.translated_languages),
+            thread_name_prefix="play-enrichment-step",
+        )
+
+        # Banners are generated off the critical path, the summary is written
+        # as soon as it is translated and the card shows up without its banner
+        self.banner_queue = BannerGenerationQueue(
+            self.vertex_ai_vision,
+            self.mlb_storage_bucket,
+            self.rate_limiters['imagen'],
+            banner_status_store=self.mlb_live_feed_collection,
+        )
+
+
+    def get_play_id(self, play):
+        play_events = play.get('playEvents', [])
+
+        if not play_events:
+            return None
+
+        return play_events[-1].get('playId')
+
+
+    def get_pending_plays(self, game_pk, all_plays):
+        # Plays summarized so far are remembered per game, so each poll only
+        # reads the play documents written since the previous one
+        play_summaries, pending_banners, synced_at = self.summarized_plays.get(str(game_pk), (set(), {}, None))
+
+        new_play_summaries, synced_at = self.mlb_live_feed_collection.fetch_new_play_summaries(
+            game_pk, since=synced_at
+        )
+        play_summaries = play_summaries | set(new_play_summaries)
+
+        # Plays summarized without a banner yet, with the prompt to generate it
+        pending_banners = dict(pending_banners)
+
+        for play_id, play_summary in new_play_summaries.items():
+            if play_summary.get('banner_status') == 'pending':
+                pending_banners[play_id] = play_summary.get('image_prompt')
+
+            else:
+                pending_banners.pop(play_id, None)
+
+        self.summarized_plays[str(game_pk)] = (play_summaries, pending_banners, synced_at)
+
+        pending_plays = []
+
+        for play in all_plays:
+            # A play that is still in progress would get summarized half way
+            if not play.get('about', {}).get('isComplete', False):
+                continue
+
+            play_id = self.get_play_id(play)
+
+            if play_id and play_id not in play_summaries:
+                pending_plays.append(play)
+
+        return pending_plays
+
+
+    def translate_play_summary(self, play_summary_json, language):
+        self.rate_limiters['translation'].acquire()
+
+        # All fields of the play go out in a single request for the language
+        translations = self.cloud_translation_api.translate_many(
+            {field: play_summary_json.get(field) for field in self.translated_fields},
+            [language],
+        )
+
+        translated_summary = {'image_prompt': play_summary_json.get('image_prompt')}
+        translated_summary.update(translations[language])
+
+        return translated_summary
+
+
+    def _renew_lease(self, game_pk, play_id, stopped):
+        # The lease is extended while the play is enriched, so slow steps (rate
+        # limits, retries) never hand it to another worker mid-run
+        while not stopped.wait(self.lease_renew_interval):
+            try:
+                if not self.leases.renew(game_pk, play_id):
+                    return
+
+            except Exception as error:
+                print(f"ERROR: {error}")
+
+
+    def enrich_play(self, game_pk, play, roster_index=None):
+        play_id = self.get_play_id(play)
+        deadline = time.monotonic() + self.lease_wait_timeout
+
+        while True:
+            if self.leases.try_acquire(game_pk, play_id):
+                stopped = threading.Event()
+                threading.Thread(
+                    target=self._renew_lease,
+                    args=(game_pk, play_id, stopped),
+                    name=f"lease-{play_id}",
+                    daemon=True,
+                ).start()
+
+                try:
+                    play_summaries = self._enrich_leased_play(game_pk, play_id, play, roster_index)
+
+                except Exception:
+                    self.leases.release(game_pk, play_id)
+                    raise
+
+                finally:
+                    stopped.set()
+
+                self.leases.complete(game_pk, play_id)
+                return play_summaries
+
+            # Another worker holds the play, its result is waited on instead of
+            # being generated a second time. Expired or failed leases are taken
+            # over on the next attempt.
+            if self.leases.get_status(game_pk, play_id) == "done":
+                return None
+
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Play {play_id} of game {game_pk} is still leased by another worker")
+
+            time.sleep(self.lease_poll_interval)
+
+
+    def _enrich_leased_play(self, game_pk, play_id, play, roster_index=None):
+        token_report = self.mlb_play_utils.get_prompt_token_report(play)
+        print(
+            f"Play {play_id}: prompt ~{token_report['compact_tokens']} tokens "
+            f"(~{token_report['raw_tokens']} for the raw play)"
+        )
+
+        self.rate_limiters['gemini'].acquire()
+        play_summary = self.vertex_ai_freeform.generate_play_by_play_summary(
+            self.mlb_play_utils.compact_play_for_prompt(play, roster_index)
+        )
+        play_summary_json = json.loads(play_summary)
+
+        translation_futures = {
+            language: self.step_executor.submit(self.translate_play_summary, play_summary_json, language)
+            for language in self.translated_languages
+        }
+
+        # The banner is generated after the summary is stored
+        play_summaries = {'English': dict(play_summary_json, banner_status='pending')}
+
+        for language, translation_future in translation_futures.items():
+            play_summaries[language] = translation_future.result()
+
+        self.mlb_live_feed_collection.add_play_summary(
+            game_pk=game_pk,
+            data_english={play_id: play_summaries['English']},
+            data_spanish={play_id: play_summaries['Spanish']},
+            data_japanese={play_id: play_summaries['Japanese']},
+            data_hindi={play_id: play_summaries['Hindi']},
+        )
+
+        # Queued once the summary is stored as pending, so a restart before the
+        # banner lands is caught up by reconcile_banners
+        self.banner_queue.submit(
+            game_pk,
+            play_id,
+            play_summary_json.get('image_prompt'),
+            fallback_key=self.get_fallback_banner_key(play),
+        )
+
+        return play_summaries
+
+
+    def get_fallback_banner_key(self, play):
+        return play.get('result', {}).get('eventType') or 'generic'
+
+
+    def reconcile_banners(self, game_pk, all_plays):
+        _, pending_banners, _ = self.summarized_plays.get(str(game_pk), (set(), {}, None))
+
+        plays_by_id = {self.get_play_id(play): play for play in all_plays}
+        queued_banner_count = 0
+
+        for play_id, image_prompt in pending_banners.items():
+            play = plays_by_id.get(play_id, {})
+
+            self.banner_queue.submit(game_pk, play_id, image_prompt, fallback_key=self.get_fallback_banner_key(play))
+            queued_banner_count += 1
+
+        return queued_banner_count
+
+
+    def process_game(self, game_pk):
+        # Returns (enriched_play_count, failed_play_count), plays still leased
+        # by another worker when the wait runs out count as failed
+        live_feed = self.mlb_stats_api.get_mlb_live_feed_incremental(game_pk)
+
+        if not live_feed:
+            return 0, 0
+
+        all_plays = live_feed.get("liveData", {}).get("plays", {}).get("allPlays", [])
+        pending_plays = self.get_pending_plays(game_pk, all_plays)
+        roster_index = self.mlb_play_utils.build_roster_index(live_feed)
+
+        failed_play_count = 0
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrent_plays, thread_name_prefix="play-enrichment") as executor:
+            # Newest plays first, so that live viewers see the latest cards soonest
+            play_futures = {
+                executor.submit(self.enrich_play, game_pk, play, roster_index): play
+                for play in reversed(pending_plays)
+            }
+
+            for play_future, play in play_futures.items():
+                try:
+                    play_future.result()
+
+                except Exception as error:
+                    failed_play_count += 1
+                    print(f"ERROR: {error}")
+                    print(f"Enriching play {self.get_play_id(play)} of game {game_pk} failed!!!\n")
+
+        # Summaries whose banner was lost (e.g. with a restarted worker) or
+        # failed are queued again, the queue drops plays it already holds
+        self.reconcile_banners(game_pk, all_plays)
+
+        return len(pending_plays) - failed_play_count, failed_play_count
+
+
+
+if __name__ == "__main__":
+    pipeline = PlaySummaryPipeline()
+    print(pipeline.process_game(747962))
@@ -0,0 +1,269 @@
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+
+class MemoryCacheBackend:
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+
+            if entry is None:
+                return None
+
+            if entry[1] is not None and entry[1] < time.time():
+                del self.entries[key]
+                return None
+
+            self.entries.move_to_end(key)
+            return entry
+
+
+    def set(self, key, value, expires_at):
+        with self.lock:
+            self.entries[key] = (value, expires_at)
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+
+class ResponseCache:
+    def __init__(self, backend=None, ttl=7 * 24 * 60 * 60, max_entries=1024):
+        # The memory tier is private to the process, the optional backend is
+        # shared with other processes (e.g. the UI and the worker)
+        self.memory = MemoryCacheBackend(max_entries=max_entries)
+        self.backend = backend
+        self.ttl = ttl
+
+        self.in_flight = {}
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+
+    @staticmethod
+    def make_key(model, prompt, config=None):
+        key_data = json.dumps(
+            {"model": model, "prompt": prompt, "config": config},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(key_data.encode("utf-8")).hexdigest()
+
+
+    def get(self, key):
+        entry = self.memory.get(key)
+
+        if entry is None and self.backend is not None:
+            try:
+                entry = self.backend.get(key)
+
+            except Exception as error:
+                print(f"ERROR: {error}")
+                entry = None
+
+            if entry is not None and entry[1] is not None and entry[1] < time.time():
+                entry = None
+
+            if entry is not None:
+                self.memory.set(key, *entry)
+
+        return entry[0] if entry is not None else None
+
+
+    def set(self, key, value):
+        expires_at = time.time() + self.ttl if self.ttl else None
+        self.memory.set(key, value, expires_at)
+
+        if self.backend is not None:
+            try:
+                self.backend.set(key, value, expires_at)
+
+            except Exception as error:
+                print(f"ERROR: {error}")
+
+
+    def _is_usable(self, value, validate):
+        return value is not None and (validate is None or validate(value))
+
+
+    def _claim(self, key, validate=None):
+        # Returns (cached value, future, is_leader). The memory tier is checked
+        # again under the lock, a leader stores its value there before it
+        # leaves the in-flight map, so no finished call is ever repeated.
+        with self.lock:
+            entry = self.memory.get(key)
+
+            if entry is not None and self._is_usable(entry[0], validate):
+                self.hits += 1
+                return entry[0], None, False
+
+            future = self.in_flight.get(key)
+
+            if future is not None:
+                self.hits += 1
+                return None, future, False
+
+            future = Future()
+            self.in_flight[key] = future
+            self.misses += 1
+
+            return None, future, True
+
+
+    def _release(self, key):
+        with self.lock:
+            del self.in_flight[key]
+
+
+    def get_or_compute(self, key, compute, validate=None):
+        # validate(value) returns False for answers that must not be cached
+        # (empty, malformed). They are raised as ValueError instead, and such
+        # values already in the cache are computed again.
+        value = self.get(key)
+
+        if self._is_usable(value, validate):
+            with self.lock:
+                self.hits += 1
+
+            return value
+
+        value, future, is_leader = self._claim(key, validate)
+
+        if value is not None:
+            return value
+
+        # Identical requests arriving while the first one is running wait on
+        # its result instead of making their own upstream call
+        if not is_leader:
+            return future.result()
+
+        try:
+            value = compute()
+
+            if not self._is_usable(value, validate):
+                raise ValueError(f"Invalid response for cache key {key}, not cached")
+
+            self.set(key, value)
+            future.set_result(value)
+            return value
+
+        except BaseException as error:
+            future.set_exception(error)
+            raise
+
+        finally:
+            self._release(key)
+
+
+    def get_or_compute_stream(self, key, compute_stream, validate=None):
+        # Streaming variant of get_or_compute: compute_stream() yields text
+        # chunks. The leader hands chunks out as they arrive, identical
+        # requests meanwhile get the whole text once the leader is done.
+        value = self.get(key)
+
+        if self._is_usable(value, validate):
+            with self.lock:
+                self.hits += 1
+
+            yield value
+            return
+
+        value, future, is_leader = self._claim(key, validate)
+
+        if value is not None:
+            yield value
+            return
+
+        if not is_leader:
+            try:
+                value = future.result()
+
+            except BaseException:
+                # The leader failed or its reader went away, answered directly
+                yield from compute_stream()
+                return
+
+            yield value
+            return
+
+        chunks = []
+
+        try:
+            for chunk in compute_stream():
+                chunks.append(chunk)
+                yield chunk
+
+            value = "".join(chunks)
+
+            # Already shown to this reader, but neither cached nor shared,
+            # waiting requests answer themselves
+            if not self._is_usable(value, validate):
+                future.set_exception(ValueError(f"Invalid response for cache key {key}, not cached"))
+                return
+
+            self.set(key, value)
+            future.set_result(value)
+
+        except BaseException as error:
+            future.set_exception(error)
+            raise
+
+        finally:
+            self._release(key)
+
+
+    def get_stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "in_flight": len(self.in_flight)}
+
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    global _response_cache
+
+    with _response_cache_lock:
+        if _response_cache is None:
+            from database.firestore import LLMResponseCacheCollection
+
+            try:
+                backend = LLMResponseCacheCollection()
+
+            except Exception as error:
+                print(f"ERROR: {error}")
+                backend = None
+
+            _response_cache = ResponseCache(backend=backend)
+
+    return _response_cache
+
+
+
+if __name__ == "__main__":
+    local_cache = ResponseCache()
+
+    key = ResponseCache.make_key("gemini-2.0-flash-exp", "Summarize the play", {"temperature": 0.7})
+    print(local_cache.get_or_compute(key, lambda: "A two run single to left field"))
+    print(local_cache.get_or_compute(key, lambda: "never computed"))
+
+    stream_key = ResponseCache.make_key("gemini-2.0-flash-exp", "Why did the batter swing?")
+    print("".join(local_cache.get_or_compute_stream(stream_key, lambda: iter(["A hanging ", "slider"]))))
+    print("".join(local_cache.get_or_compute_stream(stream_key, lambda: iter(["never computed"]))))
+    print(local_cache.get_stats())
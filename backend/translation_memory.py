@@ -0,0 +1,161 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from backend.endpoints import CloudTranslationAPI
+
+
+
+class TranslationMemory:
+    def __init__(
+        self,
+        catalog_path="assets/translations/ui_strings.json",
+        database_path=".cache/translation_memory.sqlite3",
+        max_entries=20000,
+        failure_ttl=60,
+        translation_api=None,
+    ):
+        self.max_entries = max_entries
+        self.failure_ttl = failure_ttl
+        self.memory = OrderedDict()
+        self.failed = {}
+        self.lock = threading.Lock()
+
+        # Misses are sent through the Cloud Translation API, one request per
+        # batch of up to 1024 texts, keyed here by language code
+        self.translation_api = translation_api or CloudTranslationAPI()
+        self.languages = {code: language for language, code in self.translation_api.language_codes.items()}
+
+        self.catalog = {}
+        if os.path.exists(catalog_path):
+            with open(catalog_path, encoding="utf-8") as catalog_file:
+                self.catalog = json.load(catalog_file)
+
+        os.makedirs(os.path.dirname(database_path), exist_ok=True)
+
+        self.db = sqlite3.connect(database_path, check_same_thread=False)
+        self.db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS translations (
+                source TEXT NOT NULL,
+                language TEXT NOT NULL,
+                translation TEXT NOT NULL,
+                PRIMARY KEY (source, language)
+            )
+            """
+        )
+        self.db.commit()
+
+
+    def _is_translatable(self, text):
+        return isinstance(text, str) and text.strip() != ""
+
+
+    def _remember(self, key, translation):
+        self.memory[key] = translation
+        self.memory.move_to_end(key)
+
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+
+    def lookup(self, text, language_code):
+        key = (text, language_code)
+
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                return self.memory[key]
+
+            # Texts whose translation just failed are shown as is until the
+            # failure expires, then asked for again
+            if self.failed.get(key, 0) > time.time():
+                return text
+
+            translation = self.catalog.get(language_code, {}).get(text)
+
+            if translation is None:
+                row = self.db.execute(
+                    "SELECT translation FROM translations WHERE source = ? AND language = ?",
+                    key,
+                ).fetchone()
+                translation = row[0] if row else None
+
+            if translation is not None:
+                self._remember(key, translation)
+
+            return translation
+
+
+    def store(self, translations, language_code):
+        with self.lock:
+            for text, translation in translations.items():
+                self._remember((text, language_code), translation)
+                self.failed.pop((text, language_code), None)
+
+            self.db.executemany(
+                "INSERT OR REPLACE INTO translations (source, language, translation) VALUES (?, ?, ?)",
+                [(text, language_code, translation) for text, translation in translations.items()],
+            )
+            self.db.commit()
+
+
+    def prefetch(self, texts, language_code):
+        # Every miss of a render goes out in one request instead of one per label
+        misses = list(dict.fromkeys(
+            text for text in texts
+            if self._is_translatable(text) and self.lookup(text, language_code) is None
+        ))
+
+        if not misses:
+            return 0
+
+        translated = set()
+
+        try:
+            # Each batch is stored as it arrives, so a failing request only
+            # loses its own texts
+            for batch_translations in self.translation_api.iter_translations(
+                {text: text for text in misses}, self.languages[language_code]
+            ):
+                self.store(batch_translations, language_code)
+                translated.update(batch_translations)
+
+        except Exception as error:
+            print(f"ERROR: {error}")
+
+            # Not retried on every label, but kept apart from the translations
+            # so they are retried once the failure expires
+            with self.lock:
+                now = time.time()
+                self.failed = {key: expires_at for key, expires_at in self.failed.items() if expires_at > now}
+
+                for text in misses:
+                    if text not in translated:
+                        self.failed[(text, language_code)] = now + self.failure_ttl
+
+        return len(translated)
+
+
+    def translate(self, text, language_code):
+        if not self._is_translatable(text):
+            return text
+
+        translation = self.lookup(text, language_code)
+
+        if translation is None:
+            self.prefetch([text], language_code)
+            translation = self.lookup(text, language_code)
+
+        return translation if translation is not None else text
+
+
+
+if __name__ == "__main__":
+    translation_memory = TranslationMemory()
+
+    print(translation_memory.prefetch(["Batter", "Pitcher", "Yankee Stadium"], "es"))
+    print(translation_memory.translate("Yankee Stadium", "es"))
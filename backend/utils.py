@@ -1,83 +1,469 @@
+import json
+import hashlib
+import threading
+import numpy as np
 import pandas as pd
+from dataclasses import dataclass
+from collections import OrderedDict
+
+
+
+# Plays built for the latest feed version of each game, shared by every
+# session viewing it. A new version replaces the previous one of its game.
+_plays_cache = OrderedDict()
+_plays_cache_lock = threading.Lock()
+_plays_cache_max_entries = 32
+
+# Roster indexes per game, like the plays above
+_rosters_cache = OrderedDict()
+_rosters_cache_lock = threading.Lock()
+_rosters_cache_max_entries = 32
+
+# Linescore grids per game, updated in place as innings change
+_scorecards = OrderedDict()
+_scorecards_lock = threading.Lock()
+_scorecards_max_entries = 32
+
+
+def _feed_cache_key(api_response):
+    # Feeds without a gamePk (e.g. test payloads) are only cached per object
+    game_pk = api_response.get('gamePk')
+    return str(game_pk) if game_pk is not None else id(api_response)
+
+
+@dataclass(slots=True)
+class HitData:
+    launch_speed: float = None
+    launch_angle: float = None
+    total_distance: float = None
+    trajectory: str = None
+    hardness: str = None
+
+
+@dataclass(slots=True)
+class PitchEvent:
+    pitch_type: str = None
+    start_speed: float = None
+    end_speed: float = None
+    call: str = None
+
+
+@dataclass(slots=True)
+class Play:
+    play_id: str
+    description: str
+    event: str
+    batter: str
+    batter_id: int
+    bat_side: str
+    pitcher: str
+    pitcher_id: int
+    pitch_hand: str
+    inning: int
+    half: str
+    balls: int
+    strikes: int
+    outs: int
+    away_score: int
+    home_score: int
+    rbi: int
+    is_complete: bool
+    first_pitch: PitchEvent
+    hit_data: HitData
+    raw: dict
+
+
+
+@dataclass(slots=True)
+class Player:
+    player_id: int
+    full_name: str
+    side: str
+    jersey_number: str = ''
+    position: str = ''
+    position_name: str = ''
+    batting_order: int = None
+
+    @property
+    def lineup_slot(self):
+        # battingOrder is "300" for the third starter and "301" for their substitute
+        return self.batting_order // 100 if self.batting_order else None
+
+
+
+@dataclass(slots=True)
+class RosterIndex:
+    players: dict
+    by_side: dict
+
+    def get(self, player_id):
+        return self.players.get(player_id)
+
+
 
 class MLBPlayUtils:
     def __init__(self):
         pass
 
-    def create_scorecard(self, api_response):
-        innings = api_response['liveData']['linescore']['innings']
 
-        home_team_name = api_response['gameData']['teams']['home']['teamName']
-        away_team_name = api_response['gameData']['teams']['away']['teamName']
+    def _build_pitch_event(self, play_event):
+        pitch_data = play_event.get('pitchData', {})
+        details = play_event.get('details', {})
 
-        home_data = []
-        away_data = []
+        return PitchEvent(
+            pitch_type=details.get('type', {}).get('description'),
+            start_speed=pitch_data.get('startSpeed'),
+            end_speed=pitch_data.get('endSpeed'),
+            call=details.get('call', {}).get('description'),
+        )
 
-        for inning in innings:
-            home_data.append({
-                'runs': inning['home']['runs'],
-                'hits': inning['home']['hits'],
-                'errors': inning['home']['errors'],
-                'inning_num': str(inning['num'])
-            })
 
-            away_data.append({
-                'runs': inning['away']['runs'],
-                'hits': inning['away']['hits'],
-                'errors': inning['away']['errors'],
-                'inning_num': str(inning['num'])
+    def _build_hit_data(self, hit_data):
+        return HitData(
+            launch_speed=hit_data.get('launchSpeed'),
+            launch_angle=hit_data.get('launchAngle'),
+            total_distance=hit_data.get('totalDistance'),
+            trajectory=hit_data.get('trajectory'),
+            hardness=hit_data.get('hardness'),
+        )
+
+
+    def build_play(self, play):
+        result = play.get('result', {})
+        about = play.get('about', {})
+        count = play.get('count', {})
+        matchup = play.get('matchup', {})
+        play_events = play.get('playEvents', [])
+
+        first_pitch = next((event for event in play_events if event.get('isPitch')), None)
+        hit_event = next((event for event in reversed(play_events) if event.get('hitData')), None)
+
+        return Play(
+            play_id=play_events[-1].get('playId') if play_events else None,
+            description=result.get('description', ''),
+            event=result.get('event', 'Unknown'),
+            batter=matchup.get('batter', {}).get('fullName', ''),
+            batter_id=matchup.get('batter', {}).get('id'),
+            bat_side=matchup.get('batSide', {}).get('description', ''),
+            pitcher=matchup.get('pitcher', {}).get('fullName', ''),
+            pitcher_id=matchup.get('pitcher', {}).get('id'),
+            pitch_hand=matchup.get('pitchHand', {}).get('description', ''),
+            inning=about.get('inning', 'N/A'),
+            half="Top" if about.get('isTopInning', False) else "Bottom",
+            balls=count.get('balls', 0),
+            strikes=count.get('strikes', 0),
+            outs=count.get('outs', 0),
+            away_score=result.get('awayScore', 'N/A'),
+            home_score=result.get('homeScore', 'N/A'),
+            rbi=result.get('rbi', 0),
+            is_complete=about.get('isComplete', False),
+            first_pitch=self._build_pitch_event(first_pitch) if first_pitch else None,
+            hit_data=self._build_hit_data(hit_event['hitData']) if hit_event else None,
+            raw=play,
+        )
+
+
+    def _drop_empty(self, data):
+        if isinstance(data, dict):
+            data = {key: self._drop_empty(value) for key, value in data.items()}
+            return {key: value for key, value in data.items() if value not in (None, '', [], {})}
+
+        if isinstance(data, list):
+            return [self._drop_empty(value) for value in data]
+
+        return data
+
+
+    def _describe_player(self, roster_index, player_id):
+        player = roster_index.get(player_id) if roster_index else None
+
+        if player is None:
+            return {}
+
+        return {
+            'jersey': player.jersey_number,
+            'position': player.position,
+            'lineup_slot': player.lineup_slot,
+        }
+
+
+    def compact_play_for_prompt(self, play, roster_index=None):
+        # Only what the play analysis needs: tracking coordinates, breaks,
+        # credits and ids of the raw play are left out
+        result = play.get('result', {})
+        about = play.get('about', {})
+        count = play.get('count', {})
+        matchup = play.get('matchup', {})
+
+        pitches = []
+        other_events = []
+        hit_data = {}
+
+        for play_event in play.get('playEvents', []):
+            details = play_event.get('details', {})
+
+            if play_event.get('hitData'):
+                hit_data = play_event['hitData']
+
+            if play_event.get('isPitch'):
+                pitch_data = play_event.get('pitchData', {})
+                pitch_count = play_event.get('count', {})
+
+                pitches.append({
+                    'type': details.get('type', {}).get('description'),
+                    'mph': pitch_data.get('startSpeed'),
+                    'spin': pitch_data.get('breaks', {}).get('spinRate'),
+                    'zone': pitch_data.get('zone'),
+                    'call': details.get('call', {}).get('description') or details.get('description'),
+                    'count': f"{pitch_count.get('balls', 0)}-{pitch_count.get('strikes', 0)}",
+                })
+
+            elif details.get('description'):
+                other_events.append(details['description'])
+
+        runners = []
+
+        for runner in play.get('runners', []):
+            movement = runner.get('movement', {})
+            runner_details = runner.get('details', {})
+
+            runners.append({
+                'runner': runner_details.get('runner', {}).get('fullName'),
+                'from': movement.get('start') or 'batter',
+                'to': movement.get('end'),
+                'out': movement.get('isOut') or None,
+                'event': runner_details.get('event'),
+                'scored': runner_details.get('isScoringEvent') or None,
             })
 
-        home_df = pd.DataFrame(home_data, columns=['runs', 'hits', 'errors', 'inning_num'])
-        away_df = pd.DataFrame(away_data, columns=['runs', 'hits', 'errors', 'inning_num'])
-
-        home_df['team'] = home_team_name
-        away_df['team'] = away_team_name
-
-        combined_df = pd.concat([away_df, home_df], ignore_index=True)
-        
-        # Rename columns before pivoting
-        combined_df = combined_df.rename(columns={
-            'inning_num': 'Inning',
-            'runs': 'Runs',
-            'hits': 'Hits',
-            'errors': 'Errors',
-            'team': 'Team'  # Rename the 'team' column to 'Team'
-        })
-
-        #combined_df = combined_df.add_prefix('inning_')
-        #combined_df = combined_df.set_index('inning_team')
-        
-        scorecard_df = combined_df.pivot(
-            index='Team',
-            columns='Inning', 
-            values='Runs',
+        prompt_data = {
+            'situation': {
+                'inning': f"{'Top' if about.get('isTopInning', False) else 'Bottom'} {about.get('inning')}",
+                'outs_after_play': count.get('outs'),
+                'score_after_play': f"Away {result.get('awayScore')} - Home {result.get('homeScore')}",
+            },
+            'matchup': {
+                'batter': matchup.get('batter', {}).get('fullName'),
+                'batter_roster': self._describe_player(roster_index, matchup.get('batter', {}).get('id')),
+                'bats': matchup.get('batSide', {}).get('description'),
+                'pitcher': matchup.get('pitcher', {}).get('fullName'),
+                'pitcher_roster': self._describe_player(roster_index, matchup.get('pitcher', {}).get('id')),
+                'throws': matchup.get('pitchHand', {}).get('description'),
+                'men_on_base': matchup.get('splits', {}).get('menOnBase'),
+            },
+            'pitch_sequence': pitches,
+            'other_events': other_events,
+            'hit': {
+                key: hit_data.get(key)
+                for key in ['launchSpeed', 'launchAngle', 'totalDistance', 'trajectory', 'hardness', 'location']
+            },
+            'runners': runners,
+            'result': {
+                'event': result.get('event'),
+                'description': result.get('description'),
+                'rbi': result.get('rbi'),
+            },
+        }
+
+        return json.dumps(self._drop_empty(prompt_data), separators=(',', ':'), ensure_ascii=False)
+
+
+    def estimate_prompt_tokens(self, text):
+        # Roughly four characters per token for English text and JSON
+        return (len(text) + 3) // 4
+
+
+    def get_prompt_token_report(self, play):
+        raw_prompt_data = str(play)
+        compact_prompt_data = self.compact_play_for_prompt(play)
+
+        return {
+            'play_id': (play.get('playEvents') or [{}])[-1].get('playId'),
+            'raw_characters': len(raw_prompt_data),
+            'compact_characters': len(compact_prompt_data),
+            'raw_tokens': self.estimate_prompt_tokens(raw_prompt_data),
+            'compact_tokens': self.estimate_prompt_tokens(compact_prompt_data),
+        }
+
+
+    def build_plays(self, api_response):
+        # Feeds are replaced, never mutated, so the object identifies a version
+        cache_key = _feed_cache_key(api_response)
+
+        with _plays_cache_lock:
+            cache_entry = _plays_cache.get(cache_key)
+
+            if cache_entry and cache_entry[0] is api_response:
+                _plays_cache.move_to_end(cache_key)
+                return cache_entry[1]
+
+        all_plays = api_response.get('liveData', {}).get('plays', {}).get('allPlays', [])
+        plays = [self.build_play(play) for play in all_plays]
+
+        with _plays_cache_lock:
+            _plays_cache[cache_key] = (api_response, plays)
+            _plays_cache.move_to_end(cache_key)
+
+            while len(_plays_cache) > _plays_cache_max_entries:
+                _plays_cache.popitem(last=False)
+
+        return plays
+
+
+    def _update_scorecard_grid(self, scorecard, innings):
+        previous_innings = scorecard['innings']
+        capacity = scorecard['runs'].shape[1]
+
+        if len(innings) > capacity or len(innings) < len(previous_innings):
+            # Extra innings get room for a few more before the next reallocation
+            capacity = max(9, len(innings) + 3)
+
+            for grid in ['runs', 'hits', 'errors']:
+                scorecard[grid] = np.full((2, capacity), np.nan)
+
+            previous_innings = []
+
+        # Usually only the inning being played has changed
+        for position, inning in enumerate(innings):
+            if position < len(previous_innings) and previous_innings[position] == inning:
+                continue
+
+            for row, side in enumerate(['away', 'home']):
+                for grid in ['runs', 'hits', 'errors']:
+                    scorecard[grid][row, position] = inning.get(side, {}).get(grid, np.nan)
+
+        scorecard['innings'] = innings
+
+
+    def _build_scorecard_frame(self, scorecard, away_team_name, home_team_name, include_totals):
+        innings = scorecard['innings']
+        inning_labels = [str(inning['num']) for inning in innings]
+
+        # Same column order as a pivot on the inning labels, which sorts them as strings
+        order = sorted(range(len(inning_labels)), key=lambda position: inning_labels[position])
+        runs = scorecard['runs'][:, order]
+
+        scorecard_df = pd.DataFrame(
+            runs,
+            index=pd.Index([away_team_name, home_team_name], name='Team'),
+            columns=pd.Index([inning_labels[position] for position in order], name='Inning'),
         )
 
-        scorecard_df = scorecard_df.reindex(index=[away_team_name, home_team_name])
+        # Halves not played yet stay empty without turning every run into a float
+        scorecard_df = scorecard_df.astype('Int64' if np.isnan(runs).any() else np.int64)
+
+        if include_totals:
+            for label, grid in [('R', 'runs'), ('H', 'hits'), ('E', 'errors')]:
+                scorecard_df[label] = np.nansum(scorecard[grid][:, :len(innings)], axis=1).astype(np.int64)
+
         return scorecard_df
 
 
+    def create_scorecard(self, api_response, include_totals=False):
+        innings = api_response['liveData']['linescore']['innings']
+
+        home_team_name = api_response['gameData']['teams']['home']['teamName']
+        away_team_name = api_response['gameData']['teams']['away']['teamName']
+
+        game_key = (api_response.get('gamePk'), away_team_name, home_team_name)
+        content_hash = hashlib.sha1(json.dumps(innings, sort_keys=True).encode('utf-8')).hexdigest()
+
+        with _scorecards_lock:
+            scorecard = _scorecards.get(game_key)
+
+            if scorecard is None:
+                scorecard = {
+                    'content_hash': None,
+                    'innings': [],
+                    'runs': np.full((2, 9), np.nan),
+                    'hits': np.full((2, 9), np.nan),
+                    'errors': np.full((2, 9), np.nan),
+                    'frames': {},
+                }
+                _scorecards[game_key] = scorecard
+
+            _scorecards.move_to_end(game_key)
+
+            while len(_scorecards) > _scorecards_max_entries:
+                _scorecards.popitem(last=False)
+
+            if scorecard['content_hash'] != content_hash:
+                self._update_scorecard_grid(scorecard, innings)
+                scorecard['content_hash'] = content_hash
+                scorecard['frames'] = {}
+
+            scorecard_df = scorecard['frames'].get(include_totals)
+
+            if scorecard_df is None:
+                scorecard_df = self._build_scorecard_frame(scorecard, away_team_name, home_team_name, include_totals)
+                scorecard['frames'][include_totals] = scorecard_df
+
+        # Callers get their own copy, the memoized frame is shared by every session
+        return scorecard_df.copy()
+
+
+    def build_roster_index(self, api_response):
+        cache_key = _feed_cache_key(api_response)
+
+        with _rosters_cache_lock:
+            cache_entry = _rosters_cache.get(cache_key)
+
+            if cache_entry and cache_entry[0] is api_response:
+                _rosters_cache.move_to_end(cache_key)
+                return cache_entry[1]
+
+        players = {}
+        by_side = {'away': [], 'home': []}
+
+        for side in ['away', 'home']:
+            boxscore_team = api_response.get('liveData', {}).get('boxscore', {}).get('teams', {}).get(side, {})
+
+            for player_info in boxscore_team.get('players', {}).values():
+                person = player_info.get('person', {})
+                batting_order = player_info.get('battingOrder')
+
+                player = Player(
+                    player_id=person.get('id'),
+                    full_name=person.get('fullName', ''),
+                    side=side,
+                    jersey_number=player_info.get('jerseyNumber', ''),
+                    position=player_info.get('position', {}).get('abbreviation', ''),
+                    position_name=player_info.get('position', {}).get('name', ''),
+                    batting_order=int(batting_order) if str(batting_order or '').isdigit() else None,
+                )
+
+                players[player.player_id] = player
+                by_side[side].append(player)
+
+            # Starters in batting order, then substitutes, then the bench
+            by_side[side].sort(key=lambda player: (player.batting_order is None, player.batting_order or 0, player.full_name))
+
+        roster_index = RosterIndex(players=players, by_side=by_side)
+
+        with _rosters_cache_lock:
+            _rosters_cache[cache_key] = (api_response, roster_index)
+            _rosters_cache.move_to_end(cache_key)
+
+            while len(_rosters_cache) > _rosters_cache_max_entries:
+                _rosters_cache.popitem(last=False)
+
+        return roster_index
+
+
     def get_player_details(self, data):
-        player_details = {'home': {}, 'away': {}}
-        
-        try:
-            for team_type in ['home', 'away']:
-                team_data = data['liveData']['boxscore']['teams'][team_type]
-                players = team_data['players']
-
-                for player_id, player_info in players.items():
-                    person = player_info['person']
-                    player_details[team_type][player_id] = {
-                        'player_id': person.get('id', ''),
-                        'full_name': person.get('fullName', ''),
-                        'jersey_number': player_info.get('jerseyNumber', ''),
-                    }
-        except (KeyError, TypeError):
-            print("Error: Invalid API response structure.")
-            return None
-
-        return player_details
+        roster_index = self.build_roster_index(data)
+
+        return {
+            side: {
+                f"ID{player.player_id}": {
+                    'player_id': player.player_id,
+                    'full_name': player.full_name,
+                    'jersey_number': player.jersey_number,
+                }
+                for player in players
+            }
+            for side, players in roster_index.by_side.items()
+        }
 
 
     #def get_venue(self, data):
\ No newline at end of file
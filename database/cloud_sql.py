@@ -1,95 +1,185 @@
 import json
 import random
+import threading
 import sqlalchemy
 import streamlit as st
 
-from google.cloud.sql.connector import Connector
-from google.oauth2.service_account import Credentials
+from backend.clients import get_sql_connector
 
 
 
-class UsersTable:
-    def __init__(self):
-        credentials = Credentials.from_service_account_file("config/cloud_sql_editor_service_account_key.json")
+# One pooled engine per database url, shared by every UsersTable instance in
+# the process. Cloud SQL connections are only opened when the pool needs one.
+_engines = {}
+_engines_lock = threading.Lock()
 
-        self.connector = Connector(credentials=credentials)
-        self.db_password = st.secrets["CLOUD_SQL_PASSWORD"]
+CLOUD_SQL_INSTANCE = "project-mlb-tool-tips:us-central1:admin"
 
 
-    def _get_connection(self):
-        conn = self.connector.connect(
-            "project-mlb-tool-tips:us-central1:admin",
-            "pymysql",
-            user="root",
-            password=self.db_password,
-            db="mlb_db"
-        )
-        return conn
+def _get_cloud_sql_connection():
+    conn = get_sql_connector().connect(
+        CLOUD_SQL_INSTANCE,
+        "pymysql",
+        user="root",
+        password=st.secrets["CLOUD_SQL_PASSWORD"],
+        db="mlb_db"
+    )
+    return conn
 
 
-    def create_table(self):
-        pool = sqlalchemy.create_engine(
-            "mysql+pymysql://",
-            creator=self._get_connection,
+def get_engine(database_url=None, pool_size=5, max_overflow=2, pool_recycle=1800, pool_pre_ping=True):
+    engine = _engines.get(database_url)
+
+    if engine is None:
+        with _engines_lock:
+            engine = _engines.get(database_url)
+
+            if engine is None:
+                if database_url is None:
+                    engine = sqlalchemy.create_engine(
+                        "mysql+pymysql://",
+                        creator=_get_cloud_sql_connection,
+                        pool_size=pool_size,
+                        max_overflow=max_overflow,
+                        pool_recycle=pool_recycle,
+                        pool_pre_ping=pool_pre_ping,
+                    )
+
+                elif database_url.startswith("sqlite"):
+                    # SQLite stand-in for local runs, it brings its own pool
+                    engine = sqlalchemy.create_engine(database_url, pool_pre_ping=pool_pre_ping)
+
+                else:
+                    engine = sqlalchemy.create_engine(
+                        database_url,
+                        pool_size=pool_size,
+                        max_overflow=max_overflow,
+                        pool_recycle=pool_recycle,
+                        pool_pre_ping=pool_pre_ping,
+                    )
+
+                _engines[database_url] = engine
+
+    return engine
+
+
+
+class UsersTable:
+    def __init__(self, database_url=None, pool_size=5, max_overflow=2, pool_recycle=1800, pool_pre_ping=True):
+        self.engine = get_engine(
+            database_url,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_recycle=pool_recycle,
+            pool_pre_ping=pool_pre_ping,
         )
 
-        with pool.connect() as db_conn:
-            try:
+
+    def create_table(self):
+        try:
+            with self.engine.begin() as db_conn:
                 query = sqlalchemy.text(
                     """
                     CREATE TABLE IF NOT EXISTS users (
                         user_id VARCHAR(255) PRIMARY KEY,
                         favorite_team_id VARCHAR(255),
                         followed_player_ids VARCHAR(255),
-                        followed_team_ids VARCHAR(255),
+                        followed_team_ids VARCHAR(255)
                     );
                     """
                 )
 
                 db_conn.execute(query)
                 return True
-            
-            except Exception as error:
-                return False
+
+        except Exception as error:
+            print(f"ERROR: {error}")
+            return False
+
 
     def add_user(self, user_id, favorite_team_id="", followed_player_ids=[], followed_team_ids=[]):
-        pool = sqlalchemy.create_engine(
-            "mysql+pymysql://",
-            creator=self._get_connection,
+        return self.add_users([{
+            "user_id": user_id,
+            "favorite_team_id": favorite_team_id,
+            "followed_player_ids": followed_player_ids,
+            "followed_team_ids": followed_team_ids,
+        }])
+
+
+    def add_users(self, users):
+        if not users:
+            return True
+
+        query = sqlalchemy.text(
+            """
+            INSERT INTO users (
+            user_id, favorite_team_id, followed_player_ids, followed_team_ids
+            )
+            VALUES (
+            :user_id, :favorite_team_id, :followed_player_ids, :followed_team_ids
+            )
+            """
         )
 
-        with pool.connect() as db_conn:
-            try:
-                query = sqlalchemy.text(
-                    """
-                    INSERT INTO users (
-                    user_id, favorite_team_id, followed_player_ids, followed_team_ids
-                    )
-                    VALUES (
-                    :user_id, :favorite_team_id, :followed_player_ids, :followed_team_ids
-                    )
-                    """
-                )
-                
-                db_conn.execute(
-                    query,
-                    parameters={
-                        "user_id": str(user_id), 
-                        "favorite_team_id": str(favorite_team_id), 
-                        "followed_player_ids": str(followed_player_ids), 
-                        "followed_team_ids": str(followed_team_ids)
-                    }
-                )
-
-                db_conn.commit()
+        parameters = [
+            {
+                "user_id": str(user["user_id"]),
+                "favorite_team_id": str(user.get("favorite_team_id", "")),
+                "followed_player_ids": str(user.get("followed_player_ids", [])),
+                "followed_team_ids": str(user.get("followed_team_ids", [])),
+            }
+            for user in users
+        ]
+
+        try:
+            # A list of parameters runs as a single executemany
+            with self.engine.begin() as db_conn:
+                db_conn.execute(query, parameters)
                 return True
 
-            except Exception as error:
-                db_conn.commit()
-                return False
+        except Exception as error:
+            print(f"ERROR: {error}")
+            return False
+
+
+    def get_users(self, user_ids=None):
+        if user_ids is None:
+            query = sqlalchemy.text("SELECT * FROM users")
+            parameters = {}
+
+        else:
+            if not user_ids:
+                return []
+
+            query = sqlalchemy.text(
+                "SELECT * FROM users WHERE user_id IN :user_ids"
+            ).bindparams(sqlalchemy.bindparam("user_ids", expanding=True))
+            parameters = {"user_ids": [str(user_id) for user_id in user_ids]}
+
+        try:
+            with self.engine.connect() as db_conn:
+                result = db_conn.execute(query, parameters)
+                return [dict(row) for row in result.mappings()]
+
+        except Exception as error:
+            print(f"ERROR: {error}")
+            return []
+
+
+    def get_user(self, user_id):
+        users = self.get_users([user_id])
+        return users[0] if users else None
 
 
 if __name__ == "__main__":
     users_table = UsersTable()
     ans = users_table.add_user("testuser", "123", "[123, 345, 456]", "[]")
-    print(ans)
\ No newline at end of file
+    print(ans)
+
+    local_users_table = UsersTable("sqlite://")
+    local_users_table.create_table()
+    local_users_table.add_users([
+        {"user_id": "testuser1", "favorite_team_id": "147"},
+        {"user_id": "testuser2", "favorite_team_id": "119", "followed_team_ids": [119, 147]},
+    ])
+    print(local_users_table.get_users())
@@ -1,69 +1,240 @@
 import io
+import time
+import threading
+from collections import OrderedDict
+from datetime import timedelta
 from PIL import Image
 
-from google.cloud import storage
-from google.oauth2 import service_account
+from backend.clients import get_storage_client
+
+
+
+# Renditions written for every banner at upload time, as (max size, quality).
+# Imagen returns 1024x1024 PNGs of several MB, the play cards only need a
+# small thumbnail and the details dialog the full-size image.
+BANNER_RENDITIONS = {
+    "thumbnail": ((256, 256), 75),
+    "full": (None, 85),
+}
+
+# Renditions are never overwritten once written, so browsers and CDNs can keep them
+BANNER_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Signed URLs are shared by every session in the process until shortly before
+# they expire, so they are not signed again on every rerun. Least recently
+# used URLs are dropped beyond the limit.
+_banner_urls = OrderedDict()
+_banner_urls_max_entries = 4096
+_banner_urls_lock = threading.Lock()
+
+
+def encode_banner_renditions(image_bytes):
+    image = Image.open(io.BytesIO(image_bytes))
+    image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+
+    renditions = {}
+
+    for rendition, (max_size, quality) in BANNER_RENDITIONS.items():
+        rendition_image = image.copy()
+
+        if max_size is not None:
+            rendition_image.thumbnail(max_size, Image.Resampling.LANCZOS)
+
+        output = io.BytesIO()
+        rendition_image.save(output, format="WEBP", quality=quality, method=6)
+        renditions[rendition] = output.getvalue()
+
+    return renditions
 
 
 
 class MLBStorageBucket:
-    def __init__(self):
-        credentials = service_account.Credentials.from_service_account_file(
-            "config/cloud_storage_service_account_key.json", 
-            scopes=["https://www.googleapis.com/auth/cloud-platform"]
-        )
-        
-        self.storage_client = storage.Client(
-            credentials=credentials,
-            project=credentials.project_id,
-        )
+    def __init__(self, bucket_name="mlb_storage_bucket", public_base_url=None, signed_url_ttl=timedelta(hours=12)):
+        # public_base_url is set when the bucket is served through a CDN or is
+        # publicly readable, otherwise the UI gets V4 signed URLs
+        self.storage_client = get_storage_client()
+        self.bucket_name = bucket_name
+        self.public_base_url = public_base_url
+        self.signed_url_ttl = signed_url_ttl
+
+
+    def _banner_path(self, game_pk, play_id, rendition=None):
+        # Banners uploaded before renditions existed are a single PNG
+        if rendition is None:
+            return f"play_banners/{game_pk}/{play_id}.png"
+
+        return f"play_banners/{game_pk}/{play_id}/{rendition}.webp"
+
+
+    def _fallback_banner_path(self, fallback_key, variant, rendition):
+        return f"play_banners/fallbacks/{fallback_key}/{variant}/{rendition}.webp"
+
+
+    def _upload_renditions(self, image_file, get_path):
+        bucket = self.storage_client.bucket(self.bucket_name)
+
+        for rendition, rendition_bytes in encode_banner_renditions(image_file).items():
+            blob = bucket.blob(get_path(rendition))
+            blob.cache_control = BANNER_CACHE_CONTROL
+            blob.upload_from_string(rendition_bytes, content_type="image/webp")
 
 
     def upload_play_banner(self, game_pk, play_id, image_file):
         try:
-            print(0)
-            bucket = self.storage_client.bucket("mlb_storage_bucket")
-            print(1)
-            
-            gcs_file_path = f"play_banners/{game_pk}/{play_id}.png"
-            blob = bucket.blob(gcs_file_path)
-            print(2)
-
-            blob.upload_from_string(image_file, content_type="image/png")
-            print(3)
+            self._upload_renditions(image_file, lambda rendition: self._banner_path(game_pk, play_id, rendition))
             return True
-        
+
         except Exception as error:
             print(f"ERROR: {error}")
             print(f"Saving image to GCS failed!!!\n")
             return False
 
 
-    def fetch_play_banner(self, game_pk, play_id):
+    def upload_fallback_banners(self, fallback_key, image_files):
         try:
-            bucket = self.storage_client.bucket("mlb_storage_bucket")
-            
-            gcs_file_path = f"play_banners/{game_pk}/{play_id}.png"
-            blob = bucket.blob(gcs_file_path)
-
-            image_bytes = blob.download_as_bytes()
-            return Image.open(io.BytesIO(image_bytes))
-        
+            for variant, image_file in enumerate(image_files):
+                self._upload_renditions(
+                    image_file,
+                    lambda rendition: self._fallback_banner_path(fallback_key, variant, rendition),
+                )
+
+            return True
+
+        except Exception as error:
+            print(f"ERROR: {error}")
+            print(f"Saving fallback banners to GCS failed!!!\n")
+            return False
+
+
+    def list_fallback_banner_variants(self, fallback_key):
+        try:
+            blobs = self.storage_client.list_blobs(
+                self.bucket_name, prefix=f"play_banners/fallbacks/{fallback_key}/"
+            )
+            return sorted({int(blob.name.split("/")[3]) for blob in blobs})
+
+        except Exception as error:
+            print(f"ERROR: {error}")
+            return []
+
+
+    def copy_fallback_banner(self, fallback_key, variant, game_pk, play_id):
+        # Copied inside GCS, the image never leaves the bucket
+        try:
+            bucket = self.storage_client.bucket(self.bucket_name)
+
+            for rendition in BANNER_RENDITIONS:
+                bucket.copy_blob(
+                    bucket.blob(self._fallback_banner_path(fallback_key, variant, rendition)),
+                    bucket,
+                    self._banner_path(game_pk, play_id, rendition),
+                )
+
+            return True
+
+        except Exception as error:
+            print(f"ERROR: {error}")
+            print(f"Copying fallback banner in GCS failed!!!\n")
+            return False
+
+
+    def _get_blob_url(self, blob):
+        if self.public_base_url:
+            return f"{self.public_base_url.rstrip('/')}/{blob.name}"
+
+        return blob.generate_signed_url(version="v4", expiration=self.signed_url_ttl, method="GET")
+
+
+    def get_play_banner_url(self, game_pk, play_id, rendition="thumbnail"):
+        key = (self.bucket_name, str(game_pk), play_id, rendition)
+
+        with _banner_urls_lock:
+            cached = _banner_urls.get(key)
+
+            if cached is not None:
+                if cached[1] > time.time():
+                    _banner_urls.move_to_end(key)
+                    return cached[0]
+
+                del _banner_urls[key]
+
+        try:
+            bucket = self.storage_client.bucket(self.bucket_name)
+
+            # A metadata lookup, the image itself is downloaded by the browser
+            blob = bucket.get_blob(self._banner_path(game_pk, play_id, rendition))
+
+            if blob is None:
+                blob = bucket.get_blob(self._banner_path(game_pk, play_id))
+
+            if blob is None:
+                return None
+
+            url = self._get_blob_url(blob)
+
+        except Exception as error:
+            print(f"ERROR: {error}")
+            return None
+
+        # Handed out until a quarter of the signature lifetime is left
+        expires_at = time.time() + self.signed_url_ttl.total_seconds() * 0.75
+
+        with _banner_urls_lock:
+            _banner_urls[key] = (url, expires_at)
+            _banner_urls.move_to_end(key)
+
+            while len(_banner_urls) > _banner_urls_max_entries:
+                _banner_urls.popitem(last=False)
+
+        return url
+
+
+    def fetch_play_banner_bytes(self, game_pk, play_id, rendition="thumbnail"):
+        # None when the play has no banner yet
+        try:
+            bucket = self.storage_client.bucket(self.bucket_name)
+
+            blob = bucket.get_blob(self._banner_path(game_pk, play_id, rendition))
+
+            if blob is not None:
+                return blob.download_as_bytes()
+
+            blob = bucket.get_blob(self._banner_path(game_pk, play_id))
+
+            if blob is None:
+                return None
+
+            # Legacy PNGs are shrunk to the requested rendition before caching
+            return encode_banner_renditions(blob.download_as_bytes())[rendition]
+
         except Exception as error:
             print(f"ERROR: {error}")
             print(f"Error Fetching image from GCS!!!\n")
             return None
 
 
+    def fetch_play_banner(self, game_pk, play_id, rendition="thumbnail"):
+        image_bytes = self.fetch_play_banner_bytes(game_pk, play_id, rendition)
+
+        if image_bytes is None:
+            return None
+
+        return Image.open(io.BytesIO(image_bytes))
+
+
 if __name__ == "__main__":
     mlb_storage_bucket = MLBStorageBucket()
 
     game_pk = "747962"
     play_id = "c985139e-106c-46df-8db3-ee7ec5a7ec35"
-    image_file = "test2.png"
-    
-    ans = mlb_storage_bucket.upload_play_banner(game_pk, play_id, image_file)
+
+    with open("assets/placeholders/play_placeholder.png", "rb") as image_file:
+        image_bytes = image_file.read()
+
+    print({rendition: len(data) for rendition, data in encode_banner_renditions(image_bytes).items()})
+
+    ans = mlb_storage_bucket.upload_play_banner(game_pk, play_id, image_bytes)
     print(ans, "\n\n")
-    
-    ans = mlb_storage_bucket.fetch_play_banner(game_pk, play_id)
-    print(ans, "\n")
\ No newline at end of file
+
+    ans = mlb_storage_bucket.get_play_banner_url(game_pk, play_id)
+    print(ans, "\n")
@@ -1,53 +1,378 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
+import os
+import time
+import socket
+from firebase_admin import firestore
+
+from backend.clients import get_firestore_client
 
 
 
 class MLBLiveFeedSummaryCollection:
     def __init__(self):
-        try:
-            cred = credentials.Certificate("config/firebase_service_account_key.json")
-            firebase_admin.initialize_app(cred)
-        except: pass
+        self.db = get_firestore_client()
 
-        self.db = firestore.client()
+        # Every game document holds a "plays" subcollection, one document per
+        # play, in each language collection
+        self.language_collections = {
+            'english': "mlb_live_feed_summary",
+            'spanish': "mlb_live_feed_summary_es",
+            'japanese': "mlb_live_feed_summary_ja",
+            'hindi': "mlb_live_feed_summary_hi",
+        }
 
+        # Firestore's limit on the number of writes in one batch commit
+        self.max_batch_writes = 500
 
-    def add_play_summary(self, game_pk, data_english, data_spanish=None, data_japanese=None, data_hindi=None):
-        self.db.collection("mlb_live_feed_summary").document(str(game_pk)).set(data_english, merge=True)
 
-        if data_spanish:
-            try:
-                self.db.collection("mlb_live_feed_summary_es").document(str(game_pk)).set(data_spanish, merge=True)
-            except Exception as error:
-                print(error)
+    def _plays_collection(self, game_pk, language='english'):
+        return (
+            self.db.collection(self.language_collections[language.lower()])
+            .document(str(game_pk))
+            .collection("plays")
+        )
+
+
+    def _play_document_data(self, play_summary):
+        play_document = dict(play_summary)
+        play_document["updated_at"] = firestore.SERVER_TIMESTAMP
+        return play_document
+
+
+    def add_play_summaries(self, game_pk, play_summaries_by_language):
+        # play_summaries_by_language is {language: {play_id: play_summary}}.
+        # Every language of a play goes into the same batch, so a play is
+        # either written in all of its languages or in none of them.
+        play_writes = {}
+
+        for language, play_summaries in play_summaries_by_language.items():
+            for play_id, play_summary in (play_summaries or {}).items():
+                play_writes.setdefault(play_id, []).append((language, play_summary))
+
+        result = {"written_play_ids": [], "failed_play_ids": {}, "commit_count": 0}
+
+        batch_play_ids = []
+        batch_write_count = 0
+
+        def commit(play_ids):
+            if not play_ids:
+                return
+
+            batch = self.db.batch()
+
+            for play_id in play_ids:
+                for language, play_summary in play_writes[play_id]:
+                    batch.set(
+                        self._plays_collection(game_pk, language).document(play_id),
+                        self._play_document_data(play_summary),
+                    )
 
-        if data_japanese:
             try:
-                self.db.collection("mlb_live_feed_summary_ja").document(str(game_pk)).set(data_japanese, merge=True)
+                batch.commit()
+                result["written_play_ids"].extend(play_ids)
+
             except Exception as error:
-                print(error)
+                print(f"ERROR: {error}")
+                result["failed_play_ids"].update({play_id: error for play_id in play_ids})
+
+            result["commit_count"] += 1
+
+        for play_id, writes in play_writes.items():
+            if batch_write_count + len(writes) > self.max_batch_writes:
+                commit(batch_play_ids)
+                batch_play_ids, batch_write_count = [], 0
+
+            batch_play_ids.append(play_id)
+            batch_write_count += len(writes)
+
+        commit(batch_play_ids)
+
+        return result
+
+
+    def add_play_summary(self, game_pk, data_english, data_spanish=None, data_japanese=None, data_hindi=None):
+        result = self.add_play_summaries(game_pk, {
+            'english': data_english,
+            'spanish': data_spanish,
+            'japanese': data_japanese,
+            'hindi': data_hindi,
+        })
+
+        if result["failed_play_ids"]:
+            raise next(iter(result["failed_play_ids"].values()))
+
+        return True
+
+
+    def set_banner_status(self, game_pk, play_id, status):
+        # Kept on the English play document, the one the worker reads
+        self._plays_collection(game_pk).document(play_id).update({
+            "banner_status": status,
+            "updated_at": firestore.SERVER_TIMESTAMP,
+        })
+        return True
 
-        if data_hindi:
+
+    def fetch_new_play_summaries(self, game_pk, language='english', since=None):
+        query = self._plays_collection(game_pk, language)
+
+        # Only plays written after the last one the caller has already seen
+        if since is not None:
+            query = query.where(filter=firestore.FieldFilter("updated_at", ">", since))
+
+        play_summaries = {}
+        latest_update = since
+
+        for document in query.order_by("updated_at").stream():
+            play_summary = document.to_dict()
+            updated_at = play_summary.pop("updated_at", None)
+
+            play_summaries[document.id] = play_summary
+
+            if updated_at is not None:
+                latest_update = updated_at
+
+        # Legacy game documents only hold the plays that were viewed before the
+        # migration, so they are merged under the play documents, never replaced
+        if since is None:
+            legacy_play_summaries = self.fetch_legacy_play_summaries(game_pk, language)
+            legacy_play_summaries.update(play_summaries)
+            play_summaries = legacy_play_summaries
+
+        return play_summaries, latest_update
+
+
+    def fetch_legacy_play_summaries(self, game_pk, language='english'):
+        result = self.db.collection(self.language_collections[language.lower()]).document(str(game_pk)).get()
+
+        return {
+            play_id: play_summary
+            for play_id, play_summary in (result.to_dict() or {}).items()
+            if isinstance(play_summary, dict)
+        }
+
+
+    def watch_play_summaries(self, game_pk, language, callback, on_error=None):
+        # callback(changed_play_summaries, removed_play_ids) runs on the
+        # listener thread, first with every play and then with each change.
+        # on_error(error) is called when a change could not be handled.
+        def on_snapshot(document_snapshots, changes, read_time):
             try:
-                self.db.collection("mlb_live_feed_summary_hi").document(str(game_pk)).set(data_hindi, merge=True)
+                changed_play_summaries = {}
+                removed_play_ids = []
+
+                for change in changes:
+                    if change.type.name == "REMOVED":
+                        removed_play_ids.append(change.document.id)
+
+                    else:
+                        play_summary = change.document.to_dict()
+                        play_summary.pop("updated_at", None)
+                        changed_play_summaries[change.document.id] = play_summary
+
+                callback(changed_play_summaries, removed_play_ids)
+
             except Exception as error:
-                print(error)
+                print(f"ERROR: {error}")
 
-        return True
+                if on_error is not None:
+                    on_error(error)
+
+        watch = self._plays_collection(game_pk, language).on_snapshot(on_snapshot)
+        return PlaySummaryWatch(watch)
 
 
     def fetch_live_feed_summary(self, game_pk, language='english'):
-        if language.lower() == 'english':
-            result = self.db.collection("mlb_live_feed_summary").document(str(game_pk)).get()
+        play_summaries, _ = self.fetch_new_play_summaries(game_pk, language)
+        return play_summaries
+
+
+    def migrate_game_document(self, game_pk, delete_legacy_fields=False):
+        legacy_summaries_by_language = {}
+
+        for language, collection in self.language_collections.items():
+            legacy_summaries = self.db.collection(collection).document(str(game_pk)).get().to_dict() or {}
+
+            legacy_summaries_by_language[language] = {
+                play_id: play_summary
+                for play_id, play_summary in legacy_summaries.items()
+                if isinstance(play_summary, dict)
+            }
+
+        result = self.add_play_summaries(game_pk, legacy_summaries_by_language)
+        written_play_ids = set(result["written_play_ids"])
+
+        for play_id, error in result["failed_play_ids"].items():
+            print(f"Game {game_pk}: play {play_id} was not migrated: {error}")
+
+        # Only fields whose play documents were written are removed
+        if delete_legacy_fields and written_play_ids:
+            for language, collection in self.language_collections.items():
+                migrated_play_ids = [
+                    play_id for play_id in legacy_summaries_by_language[language]
+                    if play_id in written_play_ids
+                ]
+
+                if migrated_play_ids:
+                    self.db.collection(collection).document(str(game_pk)).update({
+                        self.db.field_path(play_id): firestore.DELETE_FIELD
+                        for play_id in migrated_play_ids
+                    })
+
+        return sum(
+            len([play_id for play_id in play_summaries if play_id in written_play_ids])
+            for play_summaries in legacy_summaries_by_language.values()
+        )
+
+
+    def list_game_documents(self):
+        return [document.id for document in self.db.collection(self.language_collections['english']).list_documents()]
+
+
+    def request_game_enrichment(self, game_pk):
+        self.db.collection("mlb_enrichment_requests").document(str(game_pk)).set(
+            {"game_pk": str(game_pk), "requested_at": firestore.SERVER_TIMESTAMP}
+        )
+        return True
+
+
+    def fetch_requested_games(self):
+        documents = self.db.collection("mlb_enrichment_requests").stream()
+        return [document.id for document in documents]
+
+
+    def complete_game_enrichment(self, game_pk):
+        self.db.collection("mlb_enrichment_requests").document(str(game_pk)).delete()
+        return True
+
+
+
+class PlaySummaryWatch:
+    def __init__(self, watch):
+        self.watch = watch
+
+
+    def is_active(self):
+        # The Watch stream closes itself for good on errors it cannot retry
+        return not getattr(self.watch, "_closed", False)
+
+
+    def unsubscribe(self):
+        self.watch.unsubscribe()
+
+
+
+class LLMResponseCacheCollection:
+    def __init__(self):
+        self.db = get_firestore_client()
+
+
+    def get(self, key):
+        result = self.db.collection("llm_response_cache").document(key).get()
+
+        if not result.exists:
+            return None
+
+        data = result.to_dict()
+        return data.get("value"), data.get("expires_at")
+
+
+    def set(self, key, value, expires_at):
+        self.db.collection("llm_response_cache").document(key).set({
+            "value": value,
+            "expires_at": expires_at,
+            "created_at": firestore.SERVER_TIMESTAMP,
+        })
+        return True
+
+
+
+class PlayEnrichmentLeaseCollection:
+    def __init__(self, owner=None, lease_seconds=300):
+        self.db = get_firestore_client()
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+        self.lease_seconds = lease_seconds
+
+
+    def _lease_reference(self, game_pk, play_id):
+        return self.db.collection("mlb_enrichment_leases").document(f"{game_pk}_{play_id}")
+
+
+    def try_acquire(self, game_pk, play_id):
+        lease_reference = self._lease_reference(game_pk, play_id)
+        owner = self.owner
+        lease_seconds = self.lease_seconds
+
+        # Read and claim in one transaction, so only one worker in any process
+        # can move a play from free (or expired, or failed) to running
+        @firestore.transactional
+        def claim(transaction):
+            snapshot = lease_reference.get(transaction=transaction)
+            lease = snapshot.to_dict() if snapshot.exists else {}
+
+            if lease.get("status") == "done":
+                return False
+
+            if lease.get("status") == "running" and lease.get("expires_at", 0) > time.time():
+                return False
+
+            transaction.set(lease_reference, {
+                "game_pk": str(game_pk),
+                "play_id": play_id,
+                "owner": owner,
+                "status": "running",
+                "expires_at": time.time() + lease_seconds,
+            })
+            return True
+
+        return claim(self.db.transaction())
+
+
+    def get_status(self, game_pk, play_id):
+        snapshot = self._lease_reference(game_pk, play_id).get()
+
+        if not snapshot.exists:
+            return None
+
+        lease = snapshot.to_dict()
+
+        if lease.get("status") == "running" and lease.get("expires_at", 0) <= time.time():
+            return "expired"
+
+        return lease.get("status")
+
+
+    def _update_own_lease(self, game_pk, play_id, get_fields):
+        lease_reference = self._lease_reference(game_pk, play_id)
+        owner = self.owner
+
+        # Checked and written in one transaction, a worker that outlived its
+        # lease must not overwrite the lease of the worker that took over
+        @firestore.transactional
+        def update(transaction):
+            snapshot = lease_reference.get(transaction=transaction)
+            lease = snapshot.to_dict() if snapshot.exists else {}
+
+            fields = get_fields(lease) if lease.get("owner") == owner else None
+
+            if fields is None:
+                return False
+
+            transaction.update(lease_reference, fields)
+            return True
+
+        return update(self.db.transaction())
+
+
+    def renew(self, game_pk, play_id):
+        return self._update_own_lease(
+            game_pk, play_id,
+            lambda lease: {"expires_at": time.time() + self.lease_seconds} if lease.get("status") == "running" else None,
+        )
+
 
-        elif language.lower() == 'spanish':
-            result = self.db.collection("mlb_live_feed_summary_es").document(str(game_pk)).get()
+    def complete(self, game_pk, play_id):
+        return self._update_own_lease(game_pk, play_id, lambda lease: {"status": "done"})
 
-        elif language.lower() == 'japanese':
-            result = self.db.collection("mlb_live_feed_summary_ja").document(str(game_pk)).get()
 
-        elif language.lower() == 'hindi':
-            result = self.db.collection("mlb_live_feed_summary_hi").document(str(game_pk)).get()
-    
-        return result.to_dict() or {}
+    def release(self, game_pk, play_id):
+        return self._update_own_lease(game_pk, play_id, lambda lease: {"status": "failed"})
@@ -0,0 +1,112 @@
+import os
+import time
+import socket
+import sqlite3
+import threading
+
+
+
+class LocalPlayEnrichmentLeases:
+    def __init__(self, database_path=".cache/enrichment_leases.sqlite3", owner=None, lease_seconds=300):
+        # Same interface as PlayEnrichmentLeaseCollection, for local runs and
+        # tests. SQLite locks the file, so it also works across processes.
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+        self.lease_seconds = lease_seconds
+        self.lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(database_path) or ".", exist_ok=True)
+
+        self.db = sqlite3.connect(database_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS leases (
+                lease_id TEXT PRIMARY KEY,
+                owner TEXT,
+                status TEXT,
+                expires_at REAL
+            )
+            """
+        )
+
+
+    def try_acquire(self, game_pk, play_id):
+        lease_id = f"{game_pk}_{play_id}"
+
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+
+            try:
+                row = self.db.execute(
+                    "SELECT owner, status, expires_at FROM leases WHERE lease_id = ?",
+                    (lease_id,),
+                ).fetchone()
+
+                if row and (row[1] == "done" or (row[1] == "running" and row[2] > time.time())):
+                    acquired = False
+
+                else:
+                    self.db.execute(
+                        "INSERT OR REPLACE INTO leases (lease_id, owner, status, expires_at) VALUES (?, ?, 'running', ?)",
+                        (lease_id, self.owner, time.time() + self.lease_seconds),
+                    )
+                    acquired = True
+
+                self.db.execute("COMMIT")
+                return acquired
+
+            except Exception:
+                self.db.execute("ROLLBACK")
+                raise
+
+
+    def get_status(self, game_pk, play_id):
+        with self.lock:
+            row = self.db.execute(
+                "SELECT status, expires_at FROM leases WHERE lease_id = ?",
+                (f"{game_pk}_{play_id}",),
+            ).fetchone()
+
+        if not row:
+            return None
+
+        if row[0] == "running" and row[1] <= time.time():
+            return "expired"
+
+        return row[0]
+
+
+    def _set_status(self, game_pk, play_id, status):
+        # Only the owner moves its lease on. A worker that outlived its lease
+        # must not end the run of the worker that took the play over.
+        with self.lock:
+            cursor = self.db.execute(
+                "UPDATE leases SET status = ? WHERE lease_id = ? AND owner = ?",
+                (status, f"{game_pk}_{play_id}", self.owner),
+            )
+        return cursor.rowcount == 1
+
+
+    def renew(self, game_pk, play_id):
+        with self.lock:
+            cursor = self.db.execute(
+                "UPDATE leases SET expires_at = ? WHERE lease_id = ? AND owner = ? AND status = 'running'",
+                (time.time() + self.lease_seconds, f"{game_pk}_{play_id}", self.owner),
+            )
+        return cursor.rowcount == 1
+
+
+    def complete(self, game_pk, play_id):
+        return self._set_status(game_pk, play_id, "done")
+
+
+    def release(self, game_pk, play_id):
+        return self._set_status(game_pk, play_id, "failed")
+
+
+if __name__ == "__main__":
+    first_worker = LocalPlayEnrichmentLeases(owner="worker-1")
+    second_worker = LocalPlayEnrichmentLeases(owner="worker-2")
+
+    print(first_worker.try_acquire("747962", "c985139e"), second_worker.try_acquire("747962", "c985139e"))
+    first_worker.complete("747962", "c985139e")
+    print(second_worker.get_status("747962", "c985139e"))
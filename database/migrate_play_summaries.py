@@ -0,0 +1,24 @@
+import argparse
+
+from database.firestore import MLBLiveFeedSummaryCollection
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Moves play summaries from one document per game into one document per play"
+    )
+    parser.add_argument("--game-pk", action="append", default=[])
+    parser.add_argument("--all", action="store_true")
+    parser.add_argument("--delete-legacy-fields", action="store_true")
+    args = parser.parse_args()
+
+    mlb_live_feed_collection = MLBLiveFeedSummaryCollection()
+
+    game_pks = mlb_live_feed_collection.list_game_documents() if args.all else args.game_pk
+
+    for game_pk in game_pks:
+        migrated_play_count = mlb_live_feed_collection.migrate_game_document(
+            game_pk, delete_legacy_fields=args.delete_legacy_fields
+        )
+        print(f"Game {game_pk}: migrated {migrated_play_count} play summaries")
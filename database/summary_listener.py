@@ -0,0 +1,224 @@
+import time
+import threading
+
+
+
+class LocalPlaySummaryFeed:
+    # In-process stand-in for the Firestore play summary collections, with the
+    # same watch_play_summaries interface, for local runs and tests
+    def __init__(self):
+        self.play_summaries = {}
+        self.subscribers = {}
+        self.lock = threading.Lock()
+
+
+    def publish(self, game_pk, language, play_summaries):
+        key = (str(game_pk), language.lower())
+
+        with self.lock:
+            self.play_summaries.setdefault(key, {}).update(play_summaries)
+            callbacks = list(self.subscribers.get(key, []))
+
+        for callback in callbacks:
+            callback(dict(play_summaries), [])
+
+
+    def watch_play_summaries(self, game_pk, language, callback, on_error=None):
+        key = (str(game_pk), language.lower())
+
+        with self.lock:
+            self.subscribers.setdefault(key, []).append(callback)
+            current_play_summaries = dict(self.play_summaries.get(key, {}))
+
+        callback(current_play_summaries, [])
+
+        feed = self
+
+        class Subscription:
+            def is_active(self):
+                return True
+
+            def unsubscribe(self):
+                with feed.lock:
+                    feed.subscribers.get(key, []).remove(callback)
+
+        return Subscription()
+
+
+    def fetch_live_feed_summary(self, game_pk, language='english'):
+        with self.lock:
+            return dict(self.play_summaries.get((str(game_pk), language.lower()), {}))
+
+
+    def fetch_legacy_play_summaries(self, game_pk, language='english'):
+        # Nothing is stored the legacy way in the local feed
+        return {}
+
+
+
+class PlaySummaryListener:
+    def __init__(self, source, idle_seconds=30 * 60, initial_snapshot_timeout=10):
+        # source is MLBLiveFeedSummaryCollection or LocalPlaySummaryFeed
+        self.source = source
+        self.idle_seconds = idle_seconds
+        self.initial_snapshot_timeout = initial_snapshot_timeout
+
+        self.play_summaries = {}
+        self.subscriptions = {}
+        self.last_access = {}
+        self.ready = {}
+        self.failed = set()
+        self.lock = threading.Lock()
+
+
+    def _apply_changes(self, key, changed_play_summaries, removed_play_ids):
+        with self.lock:
+            # Replaced rather than mutated, so sessions iterating an older
+            # snapshot are never affected by a change arriving mid-render
+            play_summaries = dict(self.play_summaries.get(key, {}))
+            play_summaries.update(changed_play_summaries)
+
+            for play_id in removed_play_ids:
+                play_summaries.pop(play_id, None)
+
+            self.play_summaries[key] = play_summaries
+
+
+    def _subscribe(self, key):
+        game_pk, language = key
+        initial_snapshot = threading.Event()
+
+        def on_change(changed_play_summaries, removed_play_ids):
+            self._apply_changes(key, changed_play_summaries, removed_play_ids)
+            initial_snapshot.set()
+
+        def on_error(error):
+            # Picked up by the next get_play_summaries, which subscribes again
+            with self.lock:
+                self.failed.add(key)
+
+            initial_snapshot.set()
+
+        subscription = self.source.watch_play_summaries(game_pk, language, on_change, on_error)
+        initial_snapshot.wait(self.initial_snapshot_timeout)
+
+        # Plays of games that were not fully migrated are read once from the
+        # legacy document, play documents win over legacy entries
+        try:
+            legacy_play_summaries = self.source.fetch_legacy_play_summaries(game_pk, language)
+
+        except Exception as error:
+            print(f"ERROR: {error}")
+            legacy_play_summaries = {}
+
+        with self.lock:
+            current_play_summaries = self.play_summaries.get(key, {})
+
+        self._apply_changes(
+            key,
+            {
+                play_id: play_summary
+                for play_id, play_summary in legacy_play_summaries.items()
+                if play_id not in current_play_summaries
+            },
+            [],
+        )
+
+        return subscription
+
+
+    def _unsubscribe_idle_games(self):
+        now = time.monotonic()
+
+        with self.lock:
+            idle_keys = [
+                key for key, last_access in self.last_access.items()
+                if now - last_access > self.idle_seconds
+            ]
+            idle_subscriptions = [(key, self.subscriptions.pop(key, None)) for key in idle_keys]
+
+            for key in idle_keys:
+                self.last_access.pop(key, None)
+                self.play_summaries.pop(key, None)
+                self.ready.pop(key, None)
+                self.failed.discard(key)
+
+        for key, subscription in idle_subscriptions:
+            if subscription is not None:
+                subscription.unsubscribe()
+
+
+    def _drop_subscription(self, key):
+        # Called with the lock held
+        self.failed.discard(key)
+        self.ready.pop(key, None)
+        return self.subscriptions.pop(key, None)
+
+
+    def get_play_summaries(self, game_pk, language='english'):
+        key = (str(game_pk), language.lower())
+        broken_subscription = None
+
+        with self.lock:
+            self.last_access[key] = time.monotonic()
+            subscription = self.subscriptions.get(key)
+
+            # Listeners that reported an error or whose stream has closed are
+            # replaced, the summaries seen so far are served in the meantime
+            if key in self.failed or (subscription is not None and not subscription.is_active()):
+                broken_subscription = self._drop_subscription(key)
+
+            is_subscribed = key in self.subscriptions
+
+            if not is_subscribed:
+                # Reserved before subscribing, so concurrent sessions opening
+                # the same game share a single listener
+                self.subscriptions[key] = None
+                self.ready[key] = threading.Event()
+
+            ready = self.ready[key]
+
+        if broken_subscription is not None:
+            try:
+                broken_subscription.unsubscribe()
+
+            except Exception as error:
+                print(f"ERROR: {error}")
+
+        if not is_subscribed:
+            try:
+                subscription = self._subscribe(key)
+
+                with self.lock:
+                    self.subscriptions[key] = subscription
+
+            except Exception as error:
+                # Released, so the next rerun tries again instead of waiting
+                # on a listener that never started
+                print(f"ERROR: {error}")
+
+                with self.lock:
+                    if self.subscriptions.get(key) is None:
+                        self.subscriptions.pop(key, None)
+                        self.ready.pop(key, None)
+
+            finally:
+                ready.set()
+
+        else:
+            ready.wait(self.initial_snapshot_timeout)
+
+        self._unsubscribe_idle_games()
+
+        with self.lock:
+            return self.play_summaries.get(key, {})
+
+
+
+if __name__ == "__main__":
+    local_feed = LocalPlaySummaryFeed()
+    listener = PlaySummaryListener(local_feed)
+
+    print(listener.get_play_summaries("747962", "english"))
+    local_feed.publish("747962", "english", {"c985139e": {"title": "Conforto grounds into a double play"}})
+    print(listener.get_play_summaries("747962", "english"))
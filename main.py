@@ -1,26 +1,33 @@
 import time
-import json
 import base64
 import random
 import requests
 import pandas as pd
 from datetime import datetime, timedelta
-from googletrans import Translator
+from concurrent.futures import as_completed, TimeoutError as FuturesTimeoutError
 
 import streamlit as st
 import streamlit_antd_components as sac
 from streamlit_extras.stylable_container import stylable_container
 
 import firebase_admin
-from firebase_admin import auth, credentials
+from firebase_admin import auth
 
-from backend.endpoints import MLBStatsAPI, CloudTranslationAPI
-from backend.completions import VertexAIFreeform, VertexAIVision, VertexAIChat
+from backend.endpoints import MLBStatsAPI
+from backend.completions import PlayChatSessions
 from backend.utils import MLBPlayUtils
+from backend.clients import get_firebase_app
+from backend.translation_memory import TranslationMemory
+from backend.banner_cache import BannerCache
 
 from database.cloud_sql import UsersTable
 from database.cloud_storage import MLBStorageBucket
 from database.firestore import MLBLiveFeedSummaryCollection
+from database.summary_listener import PlaySummaryListener
+
+
+# Seconds a render waits for prefetched banners before leaving placeholders
+BANNER_SWAP_TIMEOUT = 3
 
 
 st.set_page_config(
@@ -88,8 +95,8 @@ if "chat_messages" not in st.session_state:
 if "game_status" not in st.session_state:
     st.session_state.game_status = 'live'
 
-if "cache_play_banners" not in st.session_state:
-    st.session_state.cache_play_banners = {}
+if "requested_enrichments" not in st.session_state:
+    st.session_state.requested_enrichments = []
 
 if "selected_date" not in st.session_state:
     st.session_state.selected_date = "today"
@@ -114,20 +121,27 @@ def set_display_play_data_interface_to_false():
     st.session_state.display_play_data_interface = False
 
 
+@st.cache_resource
+def get_translation_memory():
+    return TranslationMemory()
+
+
 def t(text, target_language=st.session_state.selected_language):
     if target_language == 'English':
         return text
 
-    translator = Translator()
-
     target_language = st.session_state.global_language_codes.get(target_language)
 
-    try:
-        translation = translator.translate(text, dest=target_language)
-        return translation.text
+    return get_translation_memory().translate(text, target_language)
 
-    except Exception as e:
-        return text
+
+def prefetch_translations(texts, target_language=st.session_state.selected_language):
+    if target_language == 'English':
+        return
+
+    target_language = st.session_state.global_language_codes.get(target_language)
+
+    get_translation_memory().prefetch(texts, target_language)
 
 
 @st.dialog(t('Key Moments from the Game'), width='large')
@@ -275,8 +289,31 @@ def create_account():
                 st.warning(error)
 
 
+@st.cache_resource
+def get_banner_cache():
+    return BannerCache(MLBStorageBucket())
+
+
+@st.cache_resource
+def get_play_summary_listener():
+    return PlaySummaryListener(MLBLiveFeedSummaryCollection())
+
+
+@st.cache_resource
+def get_play_chat_sessions():
+    return PlayChatSessions()
+
+
 @st.dialog("What Happened Here? Ask Gemini.", width="large")
-def ask_gemini(play, play_summary):
+def ask_gemini(play_id, play, play_summary):
+    play_chat = get_play_chat_sessions().get_session(
+        st.session_state.username, play_id, play, play_summary
+    )
+
+    for role, message in play_chat.get_history():
+        with st.chat_message("user" if role == "user" else "assistant"):
+            st.markdown(message)
+
     query = st.text_area(
         "Got Questions About This Play? Ask Gemini.",
         placeholder="Got Questions About This Play? Ask Gemini.",
@@ -284,10 +321,8 @@ def ask_gemini(play, play_summary):
     )
 
     if st.button("Ask Gemini", icon=":material/robot_2:"):
-        vertex_ai_chat = VertexAIChat()
-
-        response = vertex_ai_chat.ask_gemini_questions_about_play(query, play, play_summary)
-        st.info(response)
+        with st.container(border=True):
+            st.write_stream(play_chat.ask_question_stream(query))
 
 
 @st.dialog(t("Game Play Details"), width="large")
@@ -301,13 +336,13 @@ def display_play_details(play_id, play, play_banner):
             f"""
             <div class="div-truncate-heading">
                 <H3 class="h3-base">
-                    {t(play.get("result").get("description"))}
+                    {t(play.description)}
                 </H3>
             </div>
 
             <P class="p-play-analysis-dialog-outcome">
-                <B>{t("Batter")}:</B> {t(play.get('matchup').get('batter').get('fullName'))} &nbsp;•&nbsp; 
-                <B>{t("Pitcher")}:</B> {t(play.get('matchup').get('pitcher').get('fullName'))}
+                <B>{t("Batter")}:</B> {t(play.batter)} &nbsp;•&nbsp; 
+                <B>{t("Pitcher")}:</B> {t(play.pitcher)}
             </P>
 
             <div class="div-truncate-text">
@@ -358,11 +393,11 @@ def display_play_details(play_id, play, play_banner):
                 <P>
                 <B>{t("Basic Game Info")}</B>
                 <ul>
-                    <li>{t("Play Type")}: {t(play.get("result").get("event", "Unknown"))}
-                    <li>{t("Inning")}: {"Top" if play.get("about").get("isTopInning", False) else "Bottom"} {play.get("about").get("inning", "N/A")}
-                    <li>{t("Runs Scored")}: {play.get("result").get("rbi", 0)} ({t("Outs")}: {play.get('count').get('outs',0)})
-                    <li>{t("Count")}: {play.get("count").get('balls', 0)} {t("Balls")} - {play.get("count").get('strikes', 0)} {t("Strikes")}
-                    <li>{t("Score")}: {t("Away")} {play.get("result").get("awayScore", "N/A")} - {t("Home")} {play.get("result").get("homeScore", "N/A")}
+                    <li>{t("Play Type")}: {t(play.event)}
+                    <li>{t("Inning")}: {play.half} {play.inning}
+                    <li>{t("Runs Scored")}: {play.rbi} ({t("Outs")}: {play.outs})
+                    <li>{t("Count")}: {play.balls} {t("Balls")} - {play.strikes} {t("Strikes")}
+                    <li>{t("Score")}: {t("Away")} {play.away_score} - {t("Home")} {play.home_score}
                 </ul>
                 </P>
                 """, 
@@ -375,8 +410,8 @@ def display_play_details(play_id, play, play_banner):
                 <P>
                     <B>{t("Player Info")}</B>
                     <ul>
-                        <li>{t("Batter")}: {t(play.get('matchup').get('batter').get('fullName'))} ({t("Bat Side")}: {t(play.get('matchup').get('batSide').get('description'))})</li>
-                        <li>{t("Pitcher")}: {t(play.get('matchup').get('pitcher').get('fullName'))} ({t("Pitch Hand")}: {t(play.get('matchup').get('pitchHand').get('description'))})</li>
+                        <li>{t("Batter")}: {t(play.batter)} ({t("Bat Side")}: {t(play.bat_side)})</li>
+                        <li>{t("Pitcher")}: {t(play.pitcher)} ({t("Pitch Hand")}: {t(play.pitch_hand)})</li>
                     </ul>
                 </P>
                 """, 
@@ -384,32 +419,25 @@ def display_play_details(play_id, play, play_banner):
             )
 
             colx, coly =st.columns(2)
-            play_events_data = play.get('playEvents')
-
-            if play_events_data and any(event.get('isPitch') for event in play_events_data):
-                pitch_event = next(event for event in play_events_data if event.get('isPitch'))
-                pitch_data = pitch_event.get('pitchData')
 
-                if pitch_data:
-                    with colx:
-                        st.markdown(
-                            f"""
-                            <li>{t("Pitch Speed")}: {t(pitch_data.get('startSpeed'))}</li>
-                            <li>{t("Pitch Type")}: {t(pitch_event.get('details', {}).get('type', {}).get('description'))}</li>
-                            """, 
-                            unsafe_allow_html=True
-                        )
-
-            hit_data = pitch_event.get('hitData') if pitch_event else None
+            if play.first_pitch:
+                with colx:
+                    st.markdown(
+                        f"""
+                        <li>{t("Pitch Speed")}: {t(play.first_pitch.start_speed)}</li>
+                        <li>{t("Pitch Type")}: {t(play.first_pitch.pitch_type)}</li>
+                        """, 
+                        unsafe_allow_html=True
+                    )
 
-            if hit_data:
+            if play.hit_data:
                 with coly:
                     st.markdown(
                         f"""
                         <ul>
-                            <li>{t("Launch Speed:")} {t(hit_data.get('launchSpeed'))}</li>
-                            <li>{t("Launch Angle")}: {t(hit_data.get('launchAngle'))}</li>
-                            <li>{t("Hit Distance")}: {t(hit_data.get('totalDistance'))}</li>
+                            <li>{t("Launch Speed:")} {t(play.hit_data.launch_speed)}</li>
+                            <li>{t("Launch Angle")}: {t(play.hit_data.launch_angle)}</li>
+                            <li>{t("Hit Distance")}: {t(play.hit_data.total_distance)}</li>
                         </ul>
                         """, 
                         unsafe_allow_html=True
@@ -515,11 +543,20 @@ if __name__ == '__main__':
 
                 if ("live_feed_api_response" not in st.session_state) or (st.session_state.game_status.lower() == 'live'):
                     mlb_stats_api = MLBStatsAPI()
-                    st.session_state.live_feed_api_response = mlb_stats_api.get_mlb_live_feed(st.session_state.game_pk)
+                    st.session_state.live_feed_api_response = mlb_stats_api.get_mlb_live_feed_compact(st.session_state.game_pk)
 
                     st.session_state.game_status = st.session_state.live_feed_api_response.get("gameData", {}).get("status", {}).get("abstractGameState")
 
-                all_plays = st.session_state.live_feed_api_response.get("liveData", {}).get("plays", {}).get("allPlays", [])
+                mlb_play_utils = MLBPlayUtils()
+                all_plays = mlb_play_utils.build_plays(st.session_state.live_feed_api_response)
+                roster_index = mlb_play_utils.build_roster_index(st.session_state.live_feed_api_response)
+
+                prefetch_translations([
+                    st.session_state.live_feed_api_response.get("gameData").get("teams").get("away").get("name"),
+                    st.session_state.live_feed_api_response.get("gameData").get("teams").get("home").get("name"),
+                    st.session_state.live_feed_api_response.get('gameData').get('venue').get('name'),
+                    st.session_state.live_feed_api_response.get('gameData').get('venue').get('location').get('city'),
+                ])
 
                 with st.container(border=False):
                     cola, colb, colc, cold, cole = st.columns(
@@ -554,7 +591,7 @@ if __name__ == '__main__':
                         st.markdown(
                             f"""
                             <H4 align='center'>
-                                {all_plays[-1].get('result').get('awayScore')}&nbsp;&nbsp; - &nbsp;&nbsp;{all_plays[-1].get('result').get('homeScore')}
+                                {all_plays[-1].away_score}&nbsp;&nbsp; - &nbsp;&nbsp;{all_plays[-1].home_score}
                             </H4>
                             """, 
                             unsafe_allow_html=True
@@ -601,7 +638,7 @@ if __name__ == '__main__':
                     mlb_play_utils = MLBPlayUtils()
 
                     st.dataframe(
-                        mlb_play_utils.create_scorecard(st.session_state.live_feed_api_response),
+                        mlb_play_utils.create_scorecard(st.session_state.live_feed_api_response, include_totals=True),
                         use_container_width=True
                     )
 
@@ -613,158 +650,134 @@ if __name__ == '__main__':
                     ])
 
                     if tab_dashboard == t('Play-by-Play Analysis'):
-                        if ("play_summaries" not in st.session_state) or (st.session_state.game_status.lower() == 'live'):
-                            mlb_live_feed_collection = MLBLiveFeedSummaryCollection()
-
-                            st.session_state.play_summaries = mlb_live_feed_collection.fetch_live_feed_summary(
-                                st.session_state.game_pk,
-                                st.session_state.selected_language
-                            )
+                        # Kept up to date by one Firestore listener per game and
+                        # language, shared by every session watching that game
+                        st.session_state.play_summaries = get_play_summary_listener().get_play_summaries(
+                            st.session_state.game_pk,
+                            st.session_state.selected_language,
+                        )
 
                         play_ids_with_summary = st.session_state.play_summaries.keys() if st.session_state.play_summaries else {}
 
-                        vertext_ai_freeform = VertexAIFreeform()
-                        vertex_ai_vision = VertexAIVision()
                         mlb_storage_bucket = MLBStorageBucket()
-                        mlb_live_feed_collection = MLBLiveFeedSummaryCollection()
-                        cloud_translation_api = CloudTranslationAPI()
 
                         result_count_ribbon = f"Showing results for last {(st.session_state.result_count+1)*-1} plays of the game"
 
+                        visible_plays = all_plays[-1:st.session_state.result_count:-1]
+
+                        prefetch_translations([result_count_ribbon] + [
+                            text
+                            for play in visible_plays
+                            for text in [play.batter, play.pitcher, play.description]
+                        ])
+
                         st.markdown(
                             f"<P align='left'>{t(result_count_ribbon)}</P>", 
                             unsafe_allow_html=True
                         )
 
-                        for play in all_plays[-1:st.session_state.result_count:-1]:
-                            play_banner = None
-                            play_id = play.get('playEvents', [])[-1].get('playId')
-
-                            with st.spinner("Fetching game data.... this might take a minute"):
-                                if play_id not in play_ids_with_summary:
-                                    play_summary = vertext_ai_freeform.generate_play_by_play_summary(play)
-                                    play_summary_json = json.loads(play_summary)
-
-                                    image_prompt = play_summary_json.get("image_prompt")
-
-                                    outcome_es = cloud_translation_api.translate_text(play_summary_json.get('outcome'), 'Spanish')
-                                    overall_strategy_insights_es = cloud_translation_api.translate_text(play_summary_json.get('overall_strategy_insights'), 'Spanish')
-                                    setup_es = cloud_translation_api.translate_text(play_summary_json.get('setup'), 'Spanish')
-                                    summary_of_play_events_es = cloud_translation_api.translate_text(play_summary_json.get('summary_of_play_events'), 'Spanish')
-                                    title_es = cloud_translation_api.translate_text(play_summary_json.get('title'), 'Spanish')
-
-                                    play_summary_es_json = {
-                                        'image_prompt': image_prompt,
-                                        'outcome': outcome_es,
-                                        'overall_strategy_insights': overall_strategy_insights_es,
-                                        'setup': setup_es,
-                                        'summary_of_play_events': summary_of_play_events_es,
-                                        'title': title_es,
-                                    }
-
-                                    outcome_ja = cloud_translation_api.translate_text(play_summary_json.get('outcome'), 'Japanese')
-                                    overall_strategy_insights_ja = cloud_translation_api.translate_text(play_summary_json.get('overall_strategy_insights'), 'Japanese')
-                                    setup_ja = cloud_translation_api.translate_text(play_summary_json.get('setup'), 'Japanese')
-                                    summary_of_play_events_ja = cloud_translation_api.translate_text(play_summary_json.get('summary_of_play_events'), 'Japanese')
-                                    title_ja = cloud_translation_api.translate_text(play_summary_json.get('title'), 'Japanese')
-
-                                    play_summary_ja_json = {
-                                        'image_prompt': image_prompt,
-                                        'outcome': outcome_ja,
-                                        'overall_strategy_insights': overall_strategy_insights_ja,
-                                        'setup': setup_ja,
-                                        'summary_of_play_events': summary_of_play_events_ja,
-                                        'title': title_ja,
-                                    }
-
-                                    outcome_hi = cloud_translation_api.translate_text(play_summary_json.get('outcome'), 'Hindi')
-                                    overall_strategy_insights_hi = cloud_translation_api.translate_text(play_summary_json.get('overall_strategy_insights'), 'Hindi')
-                                    setup_hi = cloud_translation_api.translate_text(play_summary_json.get('setup'), 'Hindi')
-                                    summary_of_play_events_hi = cloud_translation_api.translate_text(play_summary_json.get('summary_of_play_events'), 'Hindi')
-                                    title_hi = cloud_translation_api.translate_text(play_summary_json.get('title'), 'Hindi')
-
-                                    play_summary_hi_json = {
-                                        'image_prompt': image_prompt,
-                                        'outcome': outcome_hi,
-                                        'overall_strategy_insights': overall_strategy_insights_hi,
-                                        'setup': setup_hi,
-                                        'summary_of_play_events': summary_of_play_events_hi,
-                                        'title': title_hi,
-                                    }
+                        pending_play_ids = []
 
-                                    if st.session_state.selected_language.lower() == 'english':
-                                        st.session_state.play_summaries[play_id] = play_summary_json
+                        # Banners of the visible plays and of the next page are
+                        # downloaded in parallel while the cards are drawn
+                        banner_cache = get_banner_cache()
+                        next_page_plays = all_plays[st.session_state.result_count:st.session_state.result_count-2:-1]
 
-                                    elif st.session_state.selected_language.lower() == 'spanish':
-                                        st.session_state.play_summaries[play_id] = play_summary_es_json
-
-                                    elif st.session_state.selected_language.lower() == 'japanese':
-                                        st.session_state.play_summaries[play_id] = play_summary_ja_json
-
-                                    elif st.session_state.selected_language.lower() == 'hindi':
-                                        st.session_state.play_summaries[play_id] = play_summary_hi_json
-
-                                    play_image_prompt = st.session_state.play_summaries.get(play_id).get('image_prompt')
+                        banner_futures = banner_cache.prefetch(
+                            st.session_state.game_pk,
+                            [
+                                play.play_id
+                                for play in visible_plays + next_page_plays
+                                if play.play_id in play_ids_with_summary
+                            ],
+                        )
+                        banner_slots = {}
 
-                                    try:
-                                        play_banner = vertex_ai_vision.generate_play_banner(play_image_prompt)
+                        for play in visible_plays:
+                            play_banner = None
+                            play_id = play.play_id
+
+                            play_home_score = play.home_score
+                            play_away_score = play.away_score
+                            batter = roster_index.get(play.batter_id)
+                            pitcher = roster_index.get(play.pitcher_id)
+
+                            play_batter = t(play.batter) + (f" #{batter.jersey_number}" if batter and batter.jersey_number else "")
+                            play_pitcher = t(play.pitcher) + (f" #{pitcher.jersey_number}" if pitcher and pitcher.jersey_number else "")
+
+                            if play_id not in play_ids_with_summary:
+                                # Summaries are generated by the background worker (worker.py)
+                                pending_play_ids.append(play_id)
+
+                                with stylable_container(
+                                    key="container_with_border",
+                                    css_styles="""
+                                        {
+                                            background-color: #181818;
+                                            border: 1px solid rgba(49, 51, 63, 0.2);
+                                            border-radius: 0.6rem;
+                                            padding: calc(1em - 1px)
+                                        }
+                                        """,
+                                ):
+                                    cola, colb, colc = st.columns([0.85, 2.71, 1.5])
 
-                                    except Exception as error:
-                                        play_banner = "assets/placeholders/play_placeholder.png"
+                                    with cola:
+                                        st.image(
+                                            "assets/placeholders/play_placeholder.png", 
+                                            use_container_width=True,
+                                        )
 
-                                    if play_banner != "assets/placeholders/play_placeholder.png":
-                                        mlb_storage_bucket.upload_play_banner(
-                                            st.session_state.game_pk, 
-                                            play_id, 
-                                            play_banner
+                                    with colb:
+                                        st.markdown(
+                                            f"<H5>{t('Analysis in progress...')}</H5>", 
+                                            unsafe_allow_html=True
                                         )
 
-                                    st.session_state.cache_play_banners[play_id] = play_banner
+                                        st.markdown(
+                                            f"""
+                                            <P class="p-service-request-request-id-serial-number">
+                                                {t("Batter")}: {play_batter} &nbsp;•&nbsp; {t("Pitcher")}: {play_pitcher}
+                                            </P>
 
-                                    try:
-                                        mlb_live_feed_collection.add_play_summary(
-                                            game_pk=st.session_state.game_pk, 
-                                            data_english={play_id: play_summary_json},
-                                            data_spanish={play_id: play_summary_es_json},
-                                            data_japanese={play_id: play_summary_ja_json},
-                                            data_hindi={play_id: play_summary_hi_json},
+                                            <div class="div-truncate-text">
+                                                <P align='left'>
+                                                    {t(play.description)}
+                                                </P>
+                                            </div>
+                                            """,
+                                            unsafe_allow_html=True,
                                         )
 
-                                    except Exception as error: pass
+                                    with colc:
+                                        st.markdown("<BR>", unsafe_allow_html=True)
 
-                                else:
-                                    if play_id in st.session_state.cache_play_banners:
-                                        play_banner = st.session_state.cache_play_banners[play_id]
+                                        st.markdown(
+                                            f"""
+                                            <P class="p-service-request-status" align='right'>
+                                                <font size=4>
+                                                    <B>
+                                                        {t("Away")}: {play_away_score} &nbsp;•&nbsp; {t("Home")}: {play_home_score} &nbsp;
+                                                    </B>
+                                                </font>
+                                            </P>
+                                            """, 
+                                            unsafe_allow_html=True,
+                                        )
 
-                                    else:
-                                        play_banner = mlb_storage_bucket.fetch_play_banner(st.session_state.game_pk, play_id)
+                                continue
 
-                                        if not play_banner:
-                                            play_image_prompt = st.session_state.play_summaries.get(play_id).get('image_prompt')
+                            # WebP thumbnails come from the process-wide banner cache,
+                            # every session shares the same bytes. Until a download
+                            # lands the card shows the placeholder.
+                            play_banner, is_banner_missing = banner_cache.peek(st.session_state.game_pk, play_id)
 
-                                            try:
-                                                vertex_ai_vision = VertexAIVision()
-                                                play_banner = vertex_ai_vision.generate_play_banner("Generate the image of a baseball play")
-                                                
-                                                mlb_storage_bucket.upload_play_banner(
-                                                    st.session_state.game_pk, 
-                                                    play_id, 
-                                                    play_banner
-                                                )
-
-                                            except Exception as error:
-                                                play_banner = "assets/placeholders/play_placeholder.png"
-                                        
-                                        st.session_state.cache_play_banners[play_id] = play_banner
+                            if not play_banner:
+                                play_banner = "assets/placeholders/play_placeholder.png"
 
                             play_title = st.session_state.play_summaries.get(play_id).get('title')
                             play_event_summary = st.session_state.play_summaries.get(play_id).get('summary_of_play_events')
 
-                            play_home_score = play.get('result').get('homeScore')
-                            play_away_score = play.get('result').get('awayScore')
-                            play_batter = t(play.get('matchup').get('batter').get('fullName'))
-                            play_pitcher = t(play.get('matchup').get('pitcher').get('fullName'))
-
                             with stylable_container(
                                 key="container_with_border",
                                 css_styles="""
@@ -779,12 +792,17 @@ if __name__ == '__main__':
                                 cola, colb, colc = st.columns([0.85, 2.71, 1.5])
 
                                 with cola:
+                                    banner_slot = st.empty()
+
                                     try:
-                                        st.image(
+                                        banner_slot.image(
                                             play_banner, use_container_width=True,
                                         )
                                     except: pass
 
+                                    if isinstance(play_banner, str) and not is_banner_missing:
+                                        banner_slots[play_id] = banner_slot
+
                                 with colb:
                                     st.markdown(
                                         f"<H5>{play_title}</H5>", 
@@ -841,7 +859,8 @@ if __name__ == '__main__':
                                             key=f"_ask_gemini_{play_id}"
                                         ):
                                             ask_gemini(
-                                                play, 
+                                                play_id,
+                                                mlb_play_utils.compact_play_for_prompt(play.raw, roster_index), 
                                                 st.session_state.play_summaries.get(play_id),
                                             )
 
@@ -852,7 +871,35 @@ if __name__ == '__main__':
                                             use_container_width=True, 
                                             key=f"_view_details_{play_id}"
                                         ):
-                                            display_play_details(play_id, play, play_banner)
+                                            display_play_details(
+                                                play_id,
+                                                play,
+                                                mlb_storage_bucket.get_play_banner_url(st.session_state.game_pk, play_id, "full") or play_banner,
+                                            )
+
+                        banner_slot_futures = {banner_futures[play_id]: play_id for play_id in banner_slots}
+
+                        # Banners that are not in after a few seconds keep their
+                        # placeholder, they are in the cache on the next rerun
+                        try:
+                            for banner_future in as_completed(banner_slot_futures, timeout=BANNER_SWAP_TIMEOUT):
+                                try:
+                                    play_banner = banner_future.result()
+
+                                    if play_banner:
+                                        banner_slots[banner_slot_futures[banner_future]].image(
+                                            play_banner, use_container_width=True,
+                                        )
+                                except: pass
+
+                        except FuturesTimeoutError:
+                            pass
+
+                        if pending_play_ids and st.session_state.game_pk not in st.session_state.requested_enrichments:
+                            mlb_live_feed_collection = MLBLiveFeedSummaryCollection()
+                            mlb_live_feed_collection.request_game_enrichment(st.session_state.game_pk)
+
+                            st.session_state.requested_enrichments.append(st.session_state.game_pk)
 
                         if st.button(
                             t("Load Previous Plays"), 
@@ -875,66 +922,28 @@ if __name__ == '__main__':
                         )
                         st.write(" ")
 
-                        mlb_play_utils = MLBPlayUtils()
-                        all_players = mlb_play_utils.get_player_details(st.session_state.live_feed_api_response)
+                        team_players = roster_index.by_side[selected_team.replace(" Team", "").lower()]
 
-                        cola, colb, colc, cold, cole = st.columns(5)
+                        prefetch_translations([player.full_name for player in team_players])
 
-                        for idx, player_id in enumerate(all_players[selected_team.replace(" Team", "").lower()]):
-                            if idx % 5 == 0:
-                                with cola:
-                                    player_image_url = f"https://securea.mlb.com/mlb/images/players/head_shot/{all_players[selected_team.replace(' Team', '').lower()][player_id]['player_id']}.jpg"
-                                    st.image(player_image_url, use_container_width=True)
-                                    
-                                    st.markdown(f"""
-                                        <H6>{t(all_players[selected_team.replace(' Team', '').lower()][player_id]['full_name'])}</H6><BR>
-                                        """, 
-                                        unsafe_allow_html=True
-                                    )
-                            
-                            elif idx % 5 == 1:
-                                with colb:
-                                    player_image_url = f"https://securea.mlb.com/mlb/images/players/head_shot/{all_players[selected_team.replace(' Team', '').lower()][player_id]['player_id']}.jpg"
-                                    st.image(player_image_url, use_container_width=True)
-                                    
-                                    st.markdown(f"""
-                                        <H6>{t(all_players[selected_team.replace(' Team', '').lower()][player_id]['full_name'])}</H6><BR>
-                                        """, 
-                                        unsafe_allow_html=True
-                                    )
+                        mlb_stats_api = MLBStatsAPI()
+                        headshots = mlb_stats_api.get_player_headshots([player.player_id for player in team_players])
 
-                            elif idx % 5 == 2:
-                                with colc:
-                                    player_image_url = f"https://securea.mlb.com/mlb/images/players/head_shot/{all_players[selected_team.replace(' Team', '').lower()][player_id]['player_id']}.jpg"
-                                    st.image(player_image_url, use_container_width=True)
-                                    
-                                    st.markdown(f"""
-                                        <H6>{t(all_players[selected_team.replace(' Team', '').lower()][player_id]['full_name'])}</H6><BR>
-                                        """, 
-                                        unsafe_allow_html=True
-                                    )
+                        lineup_columns = st.columns(5)
 
-                            elif idx % 5 == 3:
-                                with cold:
-                                    player_image_url = f"https://securea.mlb.com/mlb/images/players/head_shot/{all_players[selected_team.replace(' Team', '').lower()][player_id]['player_id']}.jpg"
-                                    st.image(player_image_url, use_container_width=True)
-                                    
-                                    st.markdown(f"""
-                                        <H6>{t(all_players[selected_team.replace(' Team', '').lower()][player_id]['full_name'])}</H6><BR>
-                                        """, 
-                                        unsafe_allow_html=True
-                                    )
-                            
-                            elif idx % 5 == 4:
-                                with cole:
-                                    player_image_url = f"https://securea.mlb.com/mlb/images/players/head_shot/{all_players[selected_team.replace(' Team', '').lower()][player_id]['player_id']}.jpg"
-                                    st.image(player_image_url, use_container_width=True)
-                                    
-                                    st.markdown(f"""
-                                        <H6>{t(all_players[selected_team.replace(' Team', '').lower()][player_id]['full_name'])}</H6><BR>
-                                        """, 
-                                        unsafe_allow_html=True
-                                    )
+                        for idx, player in enumerate(team_players):
+                            with lineup_columns[idx % 5]:
+                                st.image(
+                                    headshots.get(player.player_id) or f"https://securea.mlb.com/mlb/images/players/head_shot/{player.player_id}.jpg",
+                                    use_container_width=True,
+                                )
+
+                                st.markdown(f"""
+                                    <H6>{t(player.full_name)}</H6>
+                                    <P>#{player.jersey_number} &nbsp;•&nbsp; {player.position}</P>
+                                    """, 
+                                    unsafe_allow_html=True
+                                )
 
                     if tab_dashboard == t("Key Moments"):
                         if "game_highlight_videos" not in st.session_state:
@@ -942,6 +951,8 @@ if __name__ == '__main__':
                             st.session_state.game_highlight_videos = mlb_stats_api.get_game_highlight_videos(st.session_state.game_pk)
                         
                         if st.session_state.game_highlight_videos:
+                            prefetch_translations(list(st.session_state.game_highlight_videos.keys()))
+
                             cola, colb, colc = st.columns(3)
 
                             for idx, highlight in enumerate(st.session_state.game_highlight_videos):
@@ -1009,17 +1020,14 @@ if __name__ == '__main__':
                     st.dataframe(
                         mlb_stats_api.get_mlb_season_schedule(game_year),
                         use_container_width=True,
-                        hide_index=True
+                        hide_index=True,
+                        column_config={
+                            "Game Date": st.column_config.DateColumn(format="YYYY-MM-DD"),
+                        },
                     )
 
     else:
-        try:
-            firebase_credentials = credentials.Certificate(
-                    "config/firebase_service_account_key.json"
-                )
-            firebase_admin.initialize_app(firebase_credentials)
-
-        except: pass
+        get_firebase_app()
 
         _, cola, _ = st.columns([1, 2, 1])
 
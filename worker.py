@@ -0,0 +1,97 @@
+import time
+import argparse
+from datetime import datetime, timedelta
+
+from backend.pipeline import PlaySummaryPipeline
+from database.local_leases import LocalPlayEnrichmentLeases
+
+
+
+class LiveGameWorker:
+    def __init__(self, poll_interval=30, **pipeline_options):
+        self.poll_interval = poll_interval
+        self.pipeline = PlaySummaryPipeline(**pipeline_options)
+
+
+    def get_games_to_process(self):
+        today = datetime.now().date()
+
+        # Late games are still live past midnight, so yesterday is also watched
+        game_pks = set()
+        for game_date in [today - timedelta(days=1), today]:
+            game_pks.update(str(game_pk) for game_pk in self.pipeline.mlb_stats_api.get_live_games(game_date))
+
+        requested_games = self.pipeline.mlb_live_feed_collection.fetch_requested_games()
+
+        return game_pks, set(requested_games)
+
+
+    def run_once(self):
+        live_games, requested_games = self.get_games_to_process()
+
+        for game_pk in live_games | requested_games:
+            try:
+                enriched_play_count, failed_play_count = self.pipeline.process_game(game_pk)
+                print(f"Game {game_pk}: enriched {enriched_play_count} plays, {failed_play_count} failed")
+
+                # Requested games that have finished only need a single
+                # complete pass, failed plays are retried on the next one
+                if game_pk in requested_games and game_pk not in live_games and not failed_play_count:
+                    self.pipeline.mlb_live_feed_collection.complete_game_enrichment(game_pk)
+
+            except Exception as error:
+                print(f"ERROR: {error}")
+                print(f"Processing game {game_pk} failed!!!\n")
+
+
+    def run_forever(self):
+        while True:
+            started_at = time.monotonic()
+            self.run_once()
+
+            elapsed_time = time.monotonic() - started_at
+            time.sleep(max(0, self.poll_interval - elapsed_time))
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Pre-computes play summaries, translations and banners for MLB games"
+    )
+    parser.add_argument("--poll-interval", type=int, default=30)
+    parser.add_argument("--game-pk", action="append", default=[])
+    parser.add_argument("--once", action="store_true")
+    parser.add_argument("--max-concurrent-plays", type=int, default=8)
+    parser.add_argument("--gemini-rpm", type=int, default=60)
+    parser.add_argument("--translation-rpm", type=int, default=300)
+    parser.add_argument("--imagen-rpm", type=int, default=20)
+    parser.add_argument(
+        "--local-leases",
+        action="store_true",
+        help="Coordinate workers through a local SQLite file instead of Firestore",
+    )
+    args = parser.parse_args()
+
+    worker = LiveGameWorker(
+        poll_interval=args.poll_interval,
+        max_concurrent_plays=args.max_concurrent_plays,
+        gemini_rpm=args.gemini_rpm,
+        translation_rpm=args.translation_rpm,
+        imagen_rpm=args.imagen_rpm,
+        leases=LocalPlayEnrichmentLeases() if args.local_leases else None,
+    )
+
+    if args.game_pk:
+        for game_pk in args.game_pk:
+            enriched_play_count, failed_play_count = worker.pipeline.process_game(game_pk)
+            print(f"Game {game_pk}: enriched {enriched_play_count} plays, {failed_play_count} failed")
+
+        # Banners are still being generated after the summaries are written
+        worker.pipeline.banner_queue.join()
+
+    elif args.once:
+        worker.run_once()
+        worker.pipeline.banner_queue.join()
+
+    else:
+        worker.run_forever()